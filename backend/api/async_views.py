@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import update_wrapper
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from api.middleware import record_queries
+
+_executor = None
+_executor_lock = threading.Lock()
+
+STREAM_BATCH = 100
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_READ_THREADS', 16), thread_name_prefix='async-read'
+            )
+        return _executor
+
+
+def run_view(view, request, args, kwargs):
+    """Runs a view and renders its response, so nothing touches the database on the event loop."""
+    with record_queries(getattr(request, '_query_recorder', None)):
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+    return response
+
+
+def run_read(view, request, args, kwargs):
+    close_old_connections()
+    try:
+        return run_view(view, request, args, kwargs)
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Wraps a viewset view for ASGI.
+
+    Actions listed in the viewset's async_actions run in a pool of
+    ASYNC_READ_THREADS threads with their own database connections, so slow
+    reads and slow clients do not queue behind each other. Everything else
+    runs on Django's single thread for sync code, as unwrapped views do.
+    """
+    async_actions = set(getattr(view.cls, 'async_actions', ()))
+
+    async def wrapper(request, *args, **kwargs):
+        action = view.actions.get(request.method.lower())
+        if action in async_actions:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(get_executor(), context.run, run_read, view, request, args, kwargs)
+        return await sync_to_async(run_view)(view, request, args, kwargs)
+
+    return update_wrapper(wrapper, view)
+
+
+def async_urlpatterns(urlpatterns):
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback), pattern.default_args, pattern.name)
+        for pattern in urlpatterns
+    ]
+
+
+class ASGIHandler(BaseASGIHandler):
+    """Django's ASGI handler, iterating streaming responses off the event loop.
+
+    Django 3.2 iterates them on the loop, where generators that read the
+    database, such as the shopping list download, cannot run. Here batches of
+    STREAM_BATCH parts are read on Django's thread for sync code, which also
+    closes the response, and sent as they come.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        parts = iter(response)
+        read = sync_to_async(lambda: list(islice(parts, STREAM_BATCH)), thread_sensitive=True)
+
+        async def send_body(message):
+            await send(message)
+            if message['type'] != 'http.response.start':
+                return
+            batch = await read()
+            while batch:
+                for part in batch:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                batch = await read()
+
+        # The base class sends the headers, the closing message and closes the response.
+        response.streaming_content = ()
+        await super().send_response(response, send_body)
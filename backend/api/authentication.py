@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from api.cache import get_cache
+
+MAX_REPLAY = 1000
+
+
+def digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def snapshot(instance):
+    return instance._state.db, [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def restore(model, state):
+    db, values = state
+    return model.from_db(db, [field.attname for field in model._meta.concrete_fields], values)
+
+
+class TokenCache:
+    """Process-local LRU of token to user snapshots with a TTL.
+
+    Entries hold field values rather than instances, so every request gets
+    its own user and token objects. Entries are keyed by a digest of the
+    token and dropped when the token is deleted or its user is saved or
+    deleted. With AUTH_TOKEN_CACHE_SHARED these revocations are also
+    appended to a log in the shared cache that every process replays before
+    reading its entries, dropping all of them when the log has gaps;
+    otherwise other processes keep a revoked token for at most
+    AUTH_TOKEN_CACHE_TTL seconds.
+    """
+
+    prefix = 'auth'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._seq = None
+        self._counts = {'hits': 0, 'misses': 0, 'revocations': 0}
+        self._flushed_at = time.monotonic()
+
+    @property
+    def size(self):
+        return getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60)
+
+    @property
+    def shared(self):
+        return getattr(settings, 'AUTH_TOKEN_CACHE_SHARED', False)
+
+    @property
+    def seq_key(self):
+        return f'{self.prefix}:seq'
+
+    def revoked_key(self, seq):
+        return f'{self.prefix}:revoked:{seq}'
+
+    def counter_key(self, name):
+        return f'{self.prefix}:{name}'
+
+    def sync(self):
+        if not self.shared:
+            return
+        cache = get_cache()
+        seq = cache.get(self.seq_key, 0)
+        with self._lock:
+            if seq == self._seq:
+                return
+            if self._seq is not None:
+                keys = [self.revoked_key(n) for n in range(self._seq + 1, seq + 1)]
+                revoked = cache.get_many(keys) if 0 < len(keys) <= MAX_REPLAY else {}
+                if keys and len(revoked) == len(keys):
+                    for key in revoked.values():
+                        self._entries.pop(key, None)
+                else:
+                    self._entries.clear()
+            self._seq = seq
+            self._generation += 1
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+        interval = getattr(settings, 'METRICS_LOG_INTERVAL', 60)
+        if time.monotonic() - self._flushed_at >= interval:
+            self.flush()
+
+    def get(self, key):
+        """Returns (user, token) for a cached token and the generation to store a miss with."""
+        self.sync()
+        key = digest(key)
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.count('misses')
+            return None, generation
+        self.count('hits')
+        _, user_model, user_state, token_model, token_state = entry
+        user = restore(user_model, user_state)
+        token = restore(token_model, token_state)
+        token.user = user
+        return (user, token), generation
+
+    def set(self, key, user, token, generation):
+        key = digest(key)
+        entry = (time.monotonic() + self.ttl, type(user), snapshot(user), type(token), snapshot(token))
+        with self._lock:
+            # Skip entries read before a revocation: it may have been for them.
+            if generation != self._generation or self.size < 1:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def revoke(self, keys):
+        keys = [digest(key) for key in keys]
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+            self._counts['revocations'] += len(keys)
+        if self.shared:
+            cache = get_cache()
+            for key in keys:
+                cache.set(self.revoked_key(self.next_seq()), key, self.ttl)
+
+    def revoke_all(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+        if self.shared:
+            # A log entry nobody can read makes every process drop its entries.
+            self.next_seq()
+
+    def next_seq(self):
+        cache = get_cache()
+        cache.add(self.seq_key, 0, None)
+        try:
+            return cache.incr(self.seq_key)
+        except ValueError:
+            cache.set(self.seq_key, 1, None)
+            return 1
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        with self._lock:
+            counts, self._counts = self._counts, dict.fromkeys(self._counts, 0)
+        cache = get_cache()
+        for name, value in counts.items():
+            if not value:
+                continue
+            key = self.counter_key(name)
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, None)
+
+    def stats(self):
+        """Hit, miss and revocation counts of all processes, as of their last flush."""
+        self.flush()
+        cache = get_cache()
+        counts = {name: cache.get(self.counter_key(name), 0) for name in self._counts}
+        lookups = counts['hits'] + counts['misses']
+        return {
+            **counts,
+            'hit_rate': counts['hits'] / lookups if lookups else 0.0,
+            'size': len(self._entries),
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self._counts, 0)
+        get_cache().delete_many([self.counter_key(name) for name in self._counts])
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token and user query for cached tokens."""
+
+    def authenticate_credentials(self, key):
+        cached, generation = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, generation)
+        return user, token
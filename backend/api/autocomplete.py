@@ -0,0 +1,90 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from api.cache import table_versions
+from recipes.models import Ingredient
+
+
+def fold(value):
+    return value.casefold()
+
+
+class IngredientIndex:
+    """Process-local ingredient name index used for autocomplete.
+
+    Entries are kept sorted by case-folded name, so prefix matches are found
+    with a binary search; names containing the lookup further in are found by
+    a scan over the same list. Results are ordered by match position, then
+    by name. The index is rebuilt when the shared 'ingredients' version
+    changes, so a worker never answers from a catalog older than the ETag it
+    sends, and at least every INGREDIENT_INDEX_TTL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._index = None
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+    def get_version(self):
+        return table_versions.get(['ingredients'])['ingredients']
+
+    def build(self, version=None):
+        with self._lock:
+            generation = self._generation
+        # Read before the rows, so a change during the build makes the next lookup rebuild again.
+        version = self.get_version() if version is None else version
+        entries = sorted(
+            (fold(name), name, pk, unit)
+            for pk, name, unit in Ingredient.objects.using(DEFAULT_DB_ALIAS).values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        index = (entries, [entry[0] for entry in entries], time.monotonic(), version)
+        with self._lock:
+            if generation == self._generation:
+                self._index = index
+        return index
+
+    def get_index(self):
+        index = self._index
+        version = self.get_version()
+        ttl = getattr(settings, 'INGREDIENT_INDEX_TTL', 300)
+        if index is None or index[3] != version or time.monotonic() - index[2] > ttl:
+            index = self.build(version)
+        return index
+
+    def search(self, lookup):
+        entries, keys, _, _ = self.get_index()
+        lookup = fold(lookup)
+
+        start = bisect.bisect_left(keys, lookup)
+        prefixed = []
+        for entry in entries[start:]:
+            if not entry[0].startswith(lookup):
+                break
+            prefixed.append(entry)
+
+        contained = []
+        if lookup:
+            for entry in entries:
+                position = entry[0].find(lookup)
+                if position > 0:
+                    contained.append((position, entry))
+            contained.sort(key=lambda item: item[0])
+
+        return [
+            Ingredient(id=pk, name=name, measurement_unit=unit)
+            for _, name, pk, unit in prefixed + [entry for _, entry in contained]
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from api.metrics import get_store
+from api.replicas import changed_recently, reading_replica
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+class ResponseCache:
+    """Caches serialized responses for anonymous readers.
+
+    Keys include a generation counter stored in the cache itself, so bumping
+    the counter invalidates every cached response at once, in all processes
+    sharing the cache backend. Hits and misses are counted per process and
+    added to the metrics store every METRICS_LOG_INTERVAL seconds, where the
+    recipe_cache command and /api/metrics/ read the totals of all processes.
+    """
+
+    params = (
+        'page', 'limit', 'cursor', 'tags', 'author', 'ordering',
+        'search', 'ingredients', 'exclude_ingredients', 'max_cooking_time',
+    )
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0}
+        self._flushed_at = time.monotonic()
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 600)
+
+    def counter_key(self, name):
+        return f'{self.prefix}:{name}'
+
+    def increment(self, name):
+        key = self.counter_key(name)
+        self.cache.add(key, 0, None)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+            return 1
+
+    def get_generation(self):
+        return self.cache.get(self.counter_key('generation'), 0)
+
+    def invalidate(self):
+        self.cache.set(self.counter_key('changed'), time.time(), None)
+        return self.increment('generation')
+
+    def changed_recently(self):
+        return reading_replica() and changed_recently(self.cache.get(self.counter_key('changed'), 0))
+
+    def make_key(self, request):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return None
+        params = request.query_params
+        if any(param not in self.params for param in params):
+            return None
+        normalized = urlencode(sorted(
+            (param, value)
+            for param in self.params
+            for value in sorted(set(params.getlist(param)))
+        ))
+        url = f'{request.scheme}://{request.get_host()}{request.path}?{normalized}'
+        digest = hashlib.md5(url.encode()).hexdigest()
+        return f'{self.prefix}:{self.get_generation()}:{digest}'
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+        interval = getattr(settings, 'METRICS_LOG_INTERVAL', 60)
+        if time.monotonic() - self._flushed_at >= interval:
+            self.flush()
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        with self._lock:
+            counts, self._counts = self._counts, dict.fromkeys(self._counts, 0)
+        store = get_store()
+        for name, value in counts.items():
+            if not value:
+                continue
+            key = self.counter_key(name)
+            store.add(key, 0, None)
+            try:
+                store.incr(key, value)
+            except ValueError:
+                store.set(key, value, None)
+
+    def stats(self):
+        """Generation and the hits and misses of all processes, as of their last flush."""
+        self.flush()
+        store = get_store()
+        hits = store.get(self.counter_key('hits'), 0)
+        misses = store.get(self.counter_key('misses'), 0)
+        return {
+            'generation': self.get_generation(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self._counts, 0)
+        get_store().delete_many([self.counter_key(name) for name in self._counts])
+
+    def __call__(self, method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = self.make_key(request)
+            if key is None:
+                return method(view, request, *args, **kwargs)
+            data = self.cache.get(key)
+            if data is not None:
+                self.count('hits')
+                response = Response(data=data)
+                response['X-Cache'] = 'HIT'
+                return response
+            self.count('misses')
+            response = method(view, request, *args, **kwargs)
+            # A replica may not have the change that started this generation yet.
+            if response.status_code == 200 and not self.changed_recently():
+                self.cache.set(key, response.data, self.timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+
+
+class TableVersions:
+    """Per-table change timestamps used as ETag and Last-Modified sources.
+
+    A table's version is the time of its last committed change; tables the
+    cache knows nothing about yet start at the current time. Versions are
+    only seen by processes sharing the cache backend.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def key(self, table):
+        return f'{self.prefix}:{table}'
+
+    def get(self, tables):
+        cache = get_cache()
+        keys = {self.key(table): table for table in tables}
+        versions = cache.get_many(keys)
+        missing = {key: time.time() for key in keys if key not in versions}
+        if missing:
+            for key, value in missing.items():
+                cache.add(key, value, None)
+            versions.update(cache.get_many(missing))
+        return {keys[key]: value for key, value in versions.items()}
+
+    def bump(self, table):
+        get_cache().set(self.key(table), time.time(), None)
+
+    def conditional(self, *tables):
+        def decorator(method):
+            @wraps(method)
+            def wrapper(view, request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return method(view, request, *args, **kwargs)
+                versions = self.get(tables)
+                last_modified = int(max(versions.values()))
+                etag = quote_etag(hashlib.md5(repr((
+                    request.user.pk,
+                    request.get_host(),
+                    request.get_full_path(),
+                    sorted(versions.items()),
+                )).encode()).hexdigest())
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=last_modified
+                )
+                if response is not None:
+                    return response
+                response = method(view, request, *args, **kwargs)
+                if response.status_code == 200 and not changed_recently(max(versions.values())):
+                    response['ETag'] = etag
+                    response['Last-Modified'] = http_date(last_modified)
+                return response
+            return wrapper
+        return decorator
+
+
+recipe_cache = ResponseCache('recipes')
+table_versions = TableVersions('versions')
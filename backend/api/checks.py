@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Warning, register
+from django.core.management.base import CommandError
+
+from api.cache import get_cache
+from api.metrics import get_store
+from api.replicas import get_pins, get_replicas
+
+SHARED_CACHE_HINT = 'Set CACHE_URL to a cache shared by all workers, e.g. redis:// or memcache://.'
+
+
+def is_process_local(cache):
+    return isinstance(cache, LocMemCache)
+
+
+def require_shared_cache(command):
+    """Stops a command whose cache invalidations the web workers, other processes, would never see."""
+    if is_process_local(get_cache()):
+        raise CommandError(
+            f'{command} invalidates cached responses and ETags through the cache, but the cache '
+            f'is local to this process. {SHARED_CACHE_HINT}'
+        )
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    """Cached responses and ETag validators are invalidated through the cache, so workers must share it."""
+    if getattr(settings, 'WEB_CONCURRENCY', 1) < 2 or not is_process_local(get_cache()):
+        return []
+    return [Error(
+        'The response cache and the table versions behind ETag and Last-Modified are '
+        f'local to each process, but WEB_CONCURRENCY starts {settings.WEB_CONCURRENCY} '
+        'workers: a worker that did not handle a change keeps serving cached responses '
+        'and 304 Not Modified from before it.',
+        hint=SHARED_CACHE_HINT,
+        id='api.E001',
+    )]
+
+
+@register()
+def check_replica_pins(app_configs, **kwargs):
+    """Read-your-writes pins must be seen by whichever worker serves the user's next read."""
+    if not get_replicas() or not is_process_local(get_pins()):
+        return []
+    return [Error(
+        'DB_REPLICA_URLS is set but the cache holding read-your-writes pins is local to '
+        'each process: a worker that did not handle a write sends the user to a replica '
+        'that may not have it yet.',
+        hint=SHARED_CACHE_HINT,
+        id='api.E002',
+    )]
+
+
+@register()
+def check_metrics_store(app_configs, **kwargs):
+    """metrics_report runs in its own process and reads what the workers flushed."""
+    if not is_process_local(get_store()):
+        return []
+    return [Warning(
+        'The metrics cache is local to each process: /api/metrics/ only reports the '
+        'worker that serves it and metrics_report reports nothing.',
+        hint='Set METRICS_CACHE_URL to a cache all processes share, e.g. filecache:// or redis://.',
+        id='api.W001',
+    )]
@@ -0,0 +1,75 @@
+from django.db.models import (Count, F, OuterRef, PositiveIntegerField, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingRecipe
+from users.models import FollowUser, User, UserStats
+
+RECIPE_COUNTERS = {
+    'favorites_count': (FavoriteRecipe, 'recipe'),
+    'shopping_count': (ShoppingRecipe, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (FollowUser, 'author'),
+}
+
+
+def shifted(field, delta):
+    return Greatest(F(field) + delta, 0, output_field=PositiveIntegerField())
+
+
+def change_recipe_counter(recipe_id, field, delta):
+    Recipe.objects.filter(pk=recipe_id).update(**{field: shifted(field, delta)})
+
+
+def change_user_counter(user_id, field, delta):
+    if user_id is None:
+        return
+    updated = UserStats.objects.filter(user_id=user_id).update(**{field: shifted(field, delta)})
+    if not updated:
+        reconcile_users(User.objects.filter(pk=user_id))
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile(queryset, counters, dry_run=False, batch_size=1000):
+    """Rewrites counters that differ from the related rows, returns how many rows drifted."""
+    actual = {f'actual_{field}': count_of(*source) for field, source in counters.items()}
+    drift = Q()
+    for field in counters:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    rows = queryset.annotate(**actual).filter(drift).values('pk', *actual)
+    model = queryset.model
+    fixed, batch = 0, []
+    for row in rows.iterator():
+        fixed += 1
+        if dry_run:
+            continue
+        batch.append(model(pk=row['pk'], **{field: row[f'actual_{field}'] for field in counters}))
+        if len(batch) >= batch_size:
+            model.objects.bulk_update(batch, list(counters))
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, list(counters))
+    return fixed
+
+
+def reconcile_recipes(queryset=None, dry_run=False):
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    return reconcile(queryset.order_by(), RECIPE_COUNTERS, dry_run)
+
+
+def reconcile_users(queryset=None, dry_run=False):
+    users = User.objects.all() if queryset is None else queryset
+    missing = users.filter(stats=None).values_list('pk', flat=True)
+    if not dry_run:
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in missing], batch_size=1000, ignore_conflicts=True
+        )
+    return reconcile(UserStats.objects.filter(user__in=users.order_by()), USER_COUNTERS, dry_run)
@@ -0,0 +1,66 @@
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.replicas import get_lag, get_replicas
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Check that reads go to replicas and that a user who writes reads from the primary'
+
+    def served_by(self, client, method, path, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        with ExitStack() as stack:
+            queries = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in (DEFAULT_DB_ALIAS, *get_replicas())
+            }
+            response = getattr(client, method)(path, **headers)
+        if response.status_code >= 400:
+            raise CommandError(f'{method.upper()} {path} returned {response.status_code}')
+        used = [alias for alias, captured in queries.items() if alias != DEFAULT_DB_ALIAS and len(captured)]
+        return 'replica' if used else 'primary'
+
+    def handle(self, *args, **options):
+        if not get_replicas():
+            raise CommandError('No replicas configured, set DB_REPLICA_URLS')
+        users = list(User.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True).order_by('id')[:2])
+        if len(users) < 2:
+            raise CommandError('At least two users are needed')
+        writer, reader = (Token.objects.get_or_create(user=user)[0].key for user in users)
+        recipe = Recipe.objects.using(DEFAULT_DB_ALIAS).exclude(
+            following_recipe__user=users[0]
+        ).values_list('id', flat=True).first()
+        if recipe is None:
+            raise CommandError('No recipe to add to favorites')
+
+        client = Client(SERVER_NAME='localhost')
+        steps = [
+            ('anonymous recipe list', 'get', '/api/recipes/?limit=6', None, 'replica'),
+            ('reader recipe list', 'get', '/api/recipes/?limit=6', reader, 'replica'),
+            ('writer adds a favorite', 'get', f'/api/recipes/{recipe}/favorite/', writer, 'primary'),
+            ('writer recipe detail', 'get', f'/api/recipes/{recipe}/', writer, 'primary'),
+            ('reader recipe detail', 'get', f'/api/recipes/{recipe}/', reader, 'replica'),
+            ('writer removes it', 'delete', f'/api/recipes/{recipe}/favorite/', writer, 'primary'),
+            ('anonymous tags', 'get', '/api/tags/', None, 'replica'),
+        ]
+        failed = 0
+        for name, method, path, token, expected in steps:
+            failed += self.report(name, self.served_by(client, method, path, token), expected)
+        time.sleep(get_lag())
+        served = self.served_by(client, 'get', f'/api/recipes/{recipe}/', writer)
+        failed += self.report(f'writer recipe detail after {get_lag()}s', served, 'replica')
+        if failed:
+            raise CommandError(f'{failed} checks failed')
+
+    def report(self, name, served, expected):
+        ok = served == expected
+        self.stdout.write(f'{name:40} {served:8} {"ok" if ok else f"expected {expected}"}')
+        return not ok
@@ -0,0 +1,100 @@
+import csv
+import io
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import table_versions
+from api.checks import require_shared_cache
+from recipes.catalog import READERS, read_catalog
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Import the ingredient catalog from CSV (name,unit), JSON arrays, JSON lines or fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--format', choices=sorted(READERS), help='Override detection by file extension')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        require_shared_cache('import_ingredients')
+        self.verbosity = options['verbosity']
+        total_read = total_created = 0
+        for path in options['paths']:
+            file_format = options['format'] or Path(path).suffix.lstrip('.').lower()
+            if file_format not in READERS:
+                raise CommandError(f'Cannot detect the format of {path}, pass --format')
+            with open(path, encoding='utf-8', newline='') as stream:
+                read, created = self.import_rows(
+                    read_catalog(stream, file_format), options['batch_size'], path
+                )
+            total_read += read
+            total_created += created
+        if total_created:
+            table_versions.bump('ingredients')
+        self.stdout.write(
+            f'Read {total_read} rows, created {total_created} ingredients, '
+            f'skipped {total_read - total_created} existing or duplicate rows'
+        )
+
+    def import_rows(self, rows, batch_size, path):
+        read = created = 0
+        insert = self.copy_batch if connection.vendor == 'postgresql' else self.bulk_create_batch
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                self.create_staging_table()
+            while True:
+                batch = set(islice(rows, batch_size))
+                if not batch:
+                    break
+                read += len(batch)
+                created += insert(batch)
+                if self.verbosity > 1:
+                    self.stdout.write(f'{path}: {read} rows read, {created} created')
+        return read, created
+
+    def bulk_create_batch(self, batch, lookup_size=500):
+        names = sorted({name for name, _ in batch})
+        existing = set()
+        for start in range(0, len(names), lookup_size):
+            existing.update(
+                Ingredient.objects.filter(
+                    name__in=names[start:start + lookup_size]
+                ).values_list('name', 'measurement_unit')
+            )
+        ingredients = [
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in sorted(batch - existing)
+        ]
+        Ingredient.objects.bulk_create(ingredients)
+        return len(ingredients)
+
+    def create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import (name text, measurement_unit text) '
+                'ON COMMIT DROP'
+            )
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(sorted(batch))
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE ingredient_import')
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT i.name, i.measurement_unit FROM ingredient_import i '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {table} t '
+                f'WHERE t.name = i.name AND t.measurement_unit = i.measurement_unit) '
+                f'ORDER BY i.name, i.measurement_unit'
+            )
+            return cursor.rowcount
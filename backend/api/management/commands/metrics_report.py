@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.metrics import metrics, percentile, render_prometheus
+
+
+class Command(BaseCommand):
+    help = 'Show per-endpoint latency and query statistics collected by MetricsMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prometheus', action='store_true', help='Print in Prometheus text format')
+        parser.add_argument('--reset', action='store_true', help='Drop collected statistics')
+
+    def handle(self, *args, **options):
+        collected = metrics.collect()
+        if options['prometheus']:
+            self.stdout.write(render_prometheus(collected), ending='')
+        else:
+            self.stdout.write(
+                f'{"endpoint":40} {"count":>7} {"avg ms":>8} {"p50 <=":>7} {"p95 <=":>7} {"p99 <=":>7} '
+                f'{"q/req":>6} {"db ms":>7} {"dupes":>6}'
+            )
+            ranked = sorted(collected.items(), key=lambda item: item[1]['duration'], reverse=True)
+            for endpoint, stats in ranked:
+                count = stats['count'] or 1
+                self.stdout.write(
+                    f'{endpoint:40} {stats["count"]:>7} {stats["duration"] / count * 1000:>8.1f} '
+                    f'{percentile(stats, 0.5):>7} {percentile(stats, 0.95):>7} {percentile(stats, 0.99):>7} '
+                    f'{stats["queries"] / count:>6.1f} {stats["db_time"] / count * 1000:>7.1f} '
+                    f'{stats["duplicates"]:>6}'
+                )
+        if options['reset']:
+            metrics.reset()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.checks import require_shared_cache
+from api.ranking import update_rankings
+
+
+class Command(BaseCommand):
+    help = 'Recompute popular and trending recipe rankings, meant to run periodically'
+
+    def handle(self, *args, **options):
+        require_shared_cache('rank_recipes')
+        result = update_rankings()
+        self.stdout.write(
+            f'Ranked {result["created"]} new recipes, '
+            f'updated popularity of {result["popular"]} and trending of {result["trending"]}'
+        )
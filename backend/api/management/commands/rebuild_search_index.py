@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import get_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the recipe full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index(options['batch_size'])
+        self.stdout.write(f'Indexed {total} recipes with {type(get_backend()).__name__}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.shopping_list import rebuild_shopping_lists
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stored shopping lists from shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', type=int, help='Only rebuild shopping lists of these user ids')
+
+    def handle(self, *args, **options):
+        users = options['users'] or None
+        rebuild_shopping_lists(users)
+        items = ShoppingListItem.objects.all()
+        if users is not None:
+            items = items.filter(user__in=users)
+        self.stdout.write(f'Shopping lists contain {items.count()} items')
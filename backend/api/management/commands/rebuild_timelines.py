@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.timeline import rebuild_timelines
+from recipes.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild following feed timelines from subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', type=int, help='Only rebuild timelines of these user ids')
+
+    def handle(self, *args, **options):
+        users = options['users'] or None
+        rebuild_timelines(users)
+        entries = TimelineEntry.objects.all()
+        if users is not None:
+            entries = entries.filter(user__in=users)
+        self.stdout.write(f'Timelines contain {entries.count()} entries')
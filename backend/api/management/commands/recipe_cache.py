@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import recipe_cache
+
+
+class Command(BaseCommand):
+    help = 'Show recipe response cache statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invalidate', action='store_true', help='Drop all cached responses')
+        parser.add_argument('--reset-stats', action='store_true', help='Reset hit/miss counters')
+
+    def handle(self, *args, **options):
+        if options['invalidate']:
+            recipe_cache.invalidate()
+        if options['reset_stats']:
+            recipe_cache.reset_stats()
+        for name, value in recipe_cache.stats().items():
+            self.stdout.write(f'{name}: {value}')
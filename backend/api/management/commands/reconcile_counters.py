@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import reconcile_recipes, reconcile_users
+
+
+class Command(BaseCommand):
+    help = 'Recompute favorites, shopping cart, recipes and followers counters that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted rows')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        recipes = reconcile_recipes(dry_run=dry_run)
+        users = reconcile_users(dry_run=dry_run)
+        action = 'Drifted' if dry_run else 'Fixed'
+        self.stdout.write(f'{action} counters: {recipes} recipes, {users} users')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.authentication import token_cache
+
+
+class Command(BaseCommand):
+    help = 'Show authentication token cache statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invalidate', action='store_true',
+            help='Drop cached tokens in every process (needs AUTH_TOKEN_CACHE_SHARED)'
+        )
+        parser.add_argument('--reset-stats', action='store_true', help='Reset hit/miss counters')
+
+    def handle(self, *args, **options):
+        if options['invalidate']:
+            token_cache.revoke_all()
+        if options['reset_stats']:
+            token_cache.reset_stats()
+        for name, value in token_cache.stats().items():
+            if name != 'size':
+                self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,142 @@
+import bisect
+import heapq
+import threading
+from array import array
+from collections import Counter
+
+from django.conf import settings
+
+from api.cache import get_cache
+from recipes.models import IngredientAmount
+
+
+class RecipeIngredientIndex:
+    """Process-local inverted index of ingredient id to recipe ids.
+
+    Posting lists are sorted arrays of recipe ids and recipe sizes live in an
+    array indexed by recipe id, so hundreds of thousands of recipes take a
+    few dozen megabytes. Matching counts posting hits with Counter, which
+    runs in C, and ranks only the recipes sharing an ingredient.
+
+    Changed recipes are appended to a log in the shared cache; every process
+    replays the log before matching and rebuilds from the database when the
+    log has gaps or is too long to replay.
+    """
+
+    prefix = 'matching'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._seq = 0
+
+    @property
+    def seq_key(self):
+        return f'{self.prefix}:seq'
+
+    def change_key(self, seq):
+        return f'{self.prefix}:change:{seq}'
+
+    def note_change(self, recipe_id):
+        cache = get_cache()
+        cache.add(self.seq_key, 0, None)
+        try:
+            seq = cache.incr(self.seq_key)
+        except ValueError:
+            cache.set(self.seq_key, 1, None)
+            seq = 1
+        timeout = getattr(settings, 'RECIPE_MATCHING_LOG_TIMEOUT', 24 * 60 * 60)
+        cache.set(self.change_key(seq), recipe_id, timeout)
+
+    def build(self):
+        seq = get_cache().get(self.seq_key, 0)
+        postings, sizes = {}, array('H')
+        amounts = IngredientAmount.objects.order_by('recipe', 'ingredient').values_list('recipe', 'ingredient')
+        previous = None
+        for pair in amounts.iterator(chunk_size=10000):
+            if pair == previous:
+                continue
+            previous = recipe_id, ingredient_id = pair
+            postings.setdefault(ingredient_id, array('q')).append(recipe_id)
+            if recipe_id >= len(sizes):
+                sizes.extend([0] * (recipe_id + 1 - len(sizes)))
+            sizes[recipe_id] += 1
+        return postings, sizes, seq
+
+    def patch(self, index, recipe_ids):
+        postings, sizes = index
+        current = {}
+        for recipe_id, ingredient_id in IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('recipe', 'ingredient'):
+            current.setdefault(recipe_id, set()).add(ingredient_id)
+        for ingredient_id, posting in postings.items():
+            for recipe_id in recipe_ids:
+                position = bisect.bisect_left(posting, recipe_id)
+                present = position < len(posting) and posting[position] == recipe_id
+                wanted = ingredient_id in current.get(recipe_id, ())
+                if present and not wanted:
+                    del posting[position]
+                elif wanted and not present:
+                    posting.insert(position, recipe_id)
+        for recipe_id, ingredient_ids in current.items():
+            for ingredient_id in ingredient_ids:
+                if ingredient_id not in postings:
+                    postings[ingredient_id] = array('q', [recipe_id])
+        for recipe_id in recipe_ids:
+            if recipe_id >= len(sizes):
+                sizes.extend([0] * (recipe_id + 1 - len(sizes)))
+            sizes[recipe_id] = len(current.get(recipe_id, ()))
+
+    def sync(self):
+        with self._lock:
+            cache = get_cache()
+            seq = cache.get(self.seq_key, 0)
+            if self._index is not None and seq == self._seq:
+                return self._index
+            limit = getattr(settings, 'RECIPE_MATCHING_MAX_REPLAY', 1000)
+            keys = [self.change_key(n) for n in range(self._seq + 1, seq + 1)]
+            changes = cache.get_many(keys) if self._index is not None and 0 < len(keys) <= limit else {}
+            if keys and len(changes) == len(keys):
+                self.patch(self._index, set(changes.values()))
+                self._seq = seq
+            else:
+                postings, sizes, self._seq = self.build()
+                self._index = (postings, sizes)
+            return self._index
+
+    def match(self, ingredient_ids, max_missing=None):
+        """Returns (recipe_id, matched, total) of recipes sharing an ingredient, unordered."""
+        postings, sizes = self.sync()
+        counts = Counter()
+        for ingredient_id in set(ingredient_ids):
+            counts.update(postings.get(ingredient_id, ()))
+        return [
+            (recipe_id, matched, sizes[recipe_id])
+            for recipe_id, matched in counts.items()
+            if max_missing is None or sizes[recipe_id] - matched <= max_missing
+        ]
+
+
+class RankedMatches:
+    """Sequence of matches ranked by coverage, then fewest missing, then newest.
+
+    Only the prefix needed for the requested slice is ranked, so paginators
+    can slice it without sorting every match.
+    """
+
+    def __init__(self, matches):
+        self.matches = matches
+
+    def __len__(self):
+        return len(self.matches)
+
+    def __getitem__(self, item):
+        stop = item.stop if isinstance(item, slice) else item + 1
+        ranked = heapq.nlargest(
+            stop, self.matches, key=lambda match: (match[1] / match[2], match[1] - match[2], match[0])
+        )
+        return ranked[item]
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
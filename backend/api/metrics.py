@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger('api.metrics')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_store():
+    return caches[getattr(settings, 'METRICS_CACHE_ALIAS', 'metrics')]
+
+
+def empty_stats():
+    return {
+        'count': 0,
+        'duration': 0.0,
+        'buckets': [0] * len(BUCKETS),
+        'queries': 0,
+        'db_time': 0.0,
+        'duplicates': 0,
+    }
+
+
+def merge_stats(target, source):
+    for name in ('count', 'duration', 'queries', 'db_time', 'duplicates'):
+        target[name] += source[name]
+    target['buckets'] = [a + b for a, b in zip(target['buckets'], source['buckets'])]
+    return target
+
+
+def percentile(stats, fraction):
+    if not stats['count']:
+        return 0.0
+    rank = stats['count'] * fraction
+    seen = 0
+    for bound, count in zip(BUCKETS, stats['buckets']):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float('inf')
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries, their time and repeats."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql, repr(params)] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+
+class MetricsRegistry:
+    """Process-local per-endpoint request statistics.
+
+    Snapshots are periodically written under the process id to the metrics
+    cache, which every process on the host shares (files by default), so
+    the metrics endpoint and the metrics_report command can merge all
+    workers.
+    """
+
+    prefix = 'metrics'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._flushed_at = time.monotonic()
+
+    def record(self, endpoint, duration, recorder):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, empty_stats())
+            stats['count'] += 1
+            stats['duration'] += duration
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][index] += 1
+                    break
+            stats['queries'] += recorder.count
+            stats['db_time'] += recorder.time
+            stats['duplicates'] += recorder.duplicates
+        if recorder.duplicates:
+            logger.debug('%s ran %d duplicate queries', endpoint, recorder.duplicates)
+        interval = getattr(settings, 'METRICS_LOG_INTERVAL', 60)
+        if time.monotonic() - self._flushed_at >= interval:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: dict(stats, buckets=list(stats['buckets']))
+                for endpoint, stats in self._stats.items()
+            }
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        snapshot = self.snapshot()
+        if not snapshot:
+            # Keeps processes that serve no requests, like metrics_report, out of the merge.
+            return
+        cache = get_store()
+        pid = os.getpid()
+        processes = cache.get(f'{self.prefix}:processes', set())
+        if pid not in processes:
+            cache.set(f'{self.prefix}:processes', processes | {pid}, None)
+        cache.set(f'{self.prefix}:{pid}', snapshot, None)
+        for endpoint, stats in sorted(snapshot.items()):
+            logger.info(
+                '%s count=%d avg=%.1fms p95<=%.3fs queries/req=%.1f db/req=%.1fms duplicates=%d',
+                endpoint,
+                stats['count'],
+                stats['duration'] / stats['count'] * 1000,
+                percentile(stats, 0.95),
+                stats['queries'] / stats['count'],
+                stats['db_time'] / stats['count'] * 1000,
+                stats['duplicates'],
+            )
+
+    def collect(self):
+        self.flush()
+        cache = get_store()
+        processes = cache.get(f'{self.prefix}:processes', set())
+        snapshots = cache.get_many([f'{self.prefix}:{pid}' for pid in processes])
+        merged = {}
+        for snapshot in snapshots.values():
+            for endpoint, stats in snapshot.items():
+                merge_stats(merged.setdefault(endpoint, empty_stats()), stats)
+        return merged
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+        cache = get_store()
+        processes = cache.get(f'{self.prefix}:processes', set())
+        cache.delete_many([f'{self.prefix}:{pid}' for pid in processes])
+        cache.delete(f'{self.prefix}:processes')
+
+
+def render_prometheus(metrics):
+    lines = [
+        '# TYPE foodgram_request_duration_seconds histogram',
+    ]
+    for endpoint, stats in sorted(metrics.items()):
+        label = f'endpoint="{endpoint}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(f'foodgram_request_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'foodgram_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+        lines.append(f'foodgram_request_duration_seconds_sum{{{label}}} {stats["duration"]}')
+        lines.append(f'foodgram_request_duration_seconds_count{{{label}}} {stats["count"]}')
+    for name, key, kind in (
+        ('foodgram_db_queries_total', 'queries', 'counter'),
+        ('foodgram_db_duration_seconds_total', 'db_time', 'counter'),
+        ('foodgram_db_duplicate_queries_total', 'duplicates', 'counter'),
+    ):
+        lines.append(f'# TYPE {name} {kind}')
+        for endpoint, stats in sorted(metrics.items()):
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {stats[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_token_cache(stats):
+    lines = []
+    for name in ('hits', 'misses', 'revocations'):
+        lines.append(f'# TYPE foodgram_token_cache_{name}_total counter')
+        lines.append(f'foodgram_token_cache_{name}_total {stats[name]}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_response_cache(stats):
+    lines = []
+    for name in ('hits', 'misses'):
+        lines.append(f'# TYPE foodgram_response_cache_{name}_total counter')
+        lines.append(f'foodgram_response_cache_{name}_total {stats[name]}')
+    lines.append('# TYPE foodgram_response_cache_generation gauge')
+    lines.append(f'foodgram_response_cache_generation {stats["generation"]}')
+    return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from api.metrics import QueryRecorder, metrics
+from api.replicas import DatabaseState, current_state, pin
+
+
+def get_endpoint(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match._func_path
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+@contextmanager
+def record_queries(recorder):
+    """Records queries of this thread's connections, if there is a recorder."""
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function so Django keeps the chain async.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def sample(self):
+        sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0)
+        return sample_rate and random.random() < sample_rate
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.sample():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        metrics.record(get_endpoint(request), time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sample():
+            return await self.get_response(request)
+
+        # Async views run their queries in other threads; they pick the recorder up from the request.
+        recorder = request._query_recorder = QueryRecorder()
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        metrics.record(get_endpoint(request), time.perf_counter() - start, recorder)
+        return response
+
+
+def pin_writer(request, state):
+    user = getattr(request, 'user', None)
+    if state.wrote and user is not None and user.is_authenticated:
+        pin(user)
+
+
+class ReplicaMiddleware:
+    """Gives each request its own database state and pins users who wrote to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = DatabaseState()
+        token = current_state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            current_state.reset(token)
+            pin_writer(request, state)
+
+    async def __acall__(self, request):
+        state = DatabaseState()
+        token = current_state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_state.reset(token)
+            if state.wrote:
+                # request.user may still be Django's lazy session user.
+                await sync_to_async(pin_writer)(request, state)
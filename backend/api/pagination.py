@@ -1,4 +1,8 @@
+from datetime import datetime
+
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor
 from rest_framework.response import Response
 
 
@@ -13,3 +17,90 @@ class CustomPagination(pagination.PageNumberPagination):
         response['next'] = self.get_next_link()
         response['previous'] = self.get_previous_link()
         return Response(response)
+
+
+class CustomCursorPagination(pagination.CursorPagination):
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', None) or self.ordering
+
+    def get_paginated_response(self, data):
+        response = {}
+        response['results'] = data
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        return Response(response)
+
+
+class KeysetCursorPagination(CustomCursorPagination):
+    """Cursor pagination over (pub_date, id) keys rather than a queryset.
+
+    For pages merged from several sources: get_keys(limit, position, reverse)
+    returns up to limit + 1 keys after position, newest first or, with
+    reverse, oldest first. The cursor holds the key of the page's last item
+    for the next link and of its first item for the previous one.
+    """
+
+    def paginate_keys(self, get_keys, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position = None if cursor is None or cursor.position is None else self.decode_position(cursor.position)
+        reverse = cursor is not None and cursor.reverse
+        keys = list(get_keys(self.page_size, position, reverse))
+        has_more = len(keys) > self.page_size
+        self.keys = keys[:self.page_size]
+        if reverse:
+            self.keys.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.keys
+
+    def decode_position(self, position):
+        pub_date, _, pk = position.rpartition('_')
+        try:
+            return datetime.fromisoformat(pub_date), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, key):
+        pub_date, pk = key
+        return f'{pub_date.isoformat()}_{pk}'
+
+    def get_next_link(self):
+        if not self.has_next or not self.keys:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.keys[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.keys:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.keys[0])))
+
+
+class CursorPaginationMixin:
+    """Switches a view to keyset pagination when the cursor param is passed.
+
+    Page-number pagination stays the default; ?cursor= (empty for the first
+    page) opts in and the next/previous links carry the cursor on.
+    """
+
+    cursor_pagination_class = CustomCursorPagination
+    cursor_ordering = None
+
+    def use_cursor_pagination(self):
+        return self.cursor_pagination_class.cursor_query_param in self.request.query_params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.use_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from api.cache import recipe_cache, table_versions
+from recipes.models import (FavoriteRecipe, RankingRun, Recipe, RecipeRank,
+                            ShoppingRecipe)
+
+RANKINGS = {
+    'popular': 'popularity',
+    'trending': 'trending',
+}
+EVENTS = (FavoriteRecipe, ShoppingRecipe)
+MIN_TRENDING = 1e-3
+
+
+def get_half_life():
+    return getattr(settings, 'TRENDING_HALF_LIFE', 24 * 60 * 60)
+
+
+def get_window():
+    return timedelta(seconds=getattr(settings, 'TRENDING_WINDOW', 7 * 24 * 60 * 60))
+
+
+def decay(age):
+    return 0.5 ** (age.total_seconds() / get_half_life())
+
+
+def order_by_rank(queryset, ranking):
+    field = RANKINGS[ranking]
+    return queryset.order_by(F(f'rank__{field}').desc(nulls_last=True), '-pub_date', '-id')
+
+
+def update_popularity():
+    total = Recipe.objects.filter(pk=OuterRef('pk')).values(
+        total=F('favorites_count') + F('shopping_count')
+    )
+    return RecipeRank.objects.exclude(
+        popularity=F('recipe__favorites_count') + F('recipe__shopping_count')
+    ).update(popularity=Subquery(total))
+
+
+def update_trending(now, last_run):
+    """Decays stored scores to now and adds the events that happened since last_run.
+
+    Without a previous run inside the window the scores are rebuilt from
+    the events of the whole window.
+    """
+    since = now - get_window()
+    if last_run is not None and since < last_run <= now:
+        RecipeRank.objects.filter(trending__gt=0).update(trending=F('trending') * decay(now - last_run))
+        RecipeRank.objects.filter(trending__gt=0, trending__lt=MIN_TRENDING).update(trending=0)
+        since = last_run
+    else:
+        RecipeRank.objects.filter(trending__gt=0).update(trending=0)
+    scores = defaultdict(float)
+    for model in EVENTS:
+        events = model.objects.filter(created__gt=since, created__lte=now).values_list('recipe', 'created')
+        for recipe_id, created in events.iterator():
+            scores[recipe_id] += decay(now - created)
+    RecipeRank.objects.bulk_update(
+        [RecipeRank(pk=recipe_id, trending=F('trending') + score) for recipe_id, score in scores.items()],
+        ['trending'],
+        batch_size=500,
+    )
+    return len(scores)
+
+
+def update_rankings(now=None):
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Stored with the scores, and locked so overlapping runs do not add the same events twice.
+        last_run = RankingRun.objects.select_for_update().filter(pk=1).values_list('computed', flat=True).first()
+        missing = Recipe.objects.filter(rank=None).values_list('pk', flat=True)
+        created = len(RecipeRank.objects.bulk_create(
+            [RecipeRank(recipe_id=recipe_id) for recipe_id in missing], batch_size=1000, ignore_conflicts=True
+        ))
+        popular = update_popularity()
+        trending = update_trending(now, last_run)
+        RankingRun.objects.update_or_create(pk=1, defaults={'computed': now})
+        if created or popular or trending:
+            transaction.on_commit(lambda: table_versions.bump('rankings'))
+            transaction.on_commit(recipe_cache.invalidate)
+    return {'created': created, 'popular': popular, 'trending': trending}
@@ -0,0 +1,110 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+current_state = ContextVar('database_state', default=None)
+
+
+class DatabaseState:
+    """Database choices of the current request, set up by ReplicaMiddleware."""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_lag():
+    return getattr(settings, 'REPLICA_LAG_SECONDS', 5)
+
+
+def get_pins():
+    # The response cache alias, which api.cache builds on this module.
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def pin_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+def pin(user):
+    """Sends the user's reads to the primary until replicas have caught up with their writes.
+
+    Pins are only seen by processes sharing the cache, which the api.E002
+    check requires when replicas are configured.
+    """
+    get_pins().set(pin_key(user.pk), True, get_lag())
+
+
+def is_pinned(user):
+    return user.is_authenticated and get_pins().get(pin_key(user.pk), False)
+
+
+def use_replica(user):
+    state = current_state.get()
+    replicas = get_replicas()
+    if state is None or state.wrote or not replicas or is_pinned(user):
+        return
+    state.replica = random.choice(replicas)
+
+
+def reading_replica():
+    state = current_state.get()
+    return state is not None and state.replica is not None
+
+
+def changed_recently(changed_at):
+    """Whether a replica read may predate a change made at changed_at."""
+    return reading_replica() and time.time() - changed_at < get_lag()
+
+
+class ReplicaRouter:
+    """Routes reads of requests that opted in to a replica and everything else to the primary.
+
+    Replicas are read-only copies of the default database, listed in
+    DATABASE_REPLICAS. A write anywhere in the request sends its remaining
+    reads to the primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state is not None and state.replica is not None:
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = True
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serves safe-method requests to replica_actions from a replica."""
+
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and request.method in SAFE_METHODS:
+            use_replica(request.user)
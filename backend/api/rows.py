@@ -0,0 +1,189 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from api.renderers import FastJSONRenderer
+from api.serializers import CustomUserSerializer
+from recipes.models import IngredientAmount, Recipe, Tag
+
+
+def group_rows(rows):
+    grouped = {}
+    for key, *values in rows:
+        grouped.setdefault(key, []).append(values)
+    return grouped
+
+
+class RowSerializer:
+    """Read-only serializer working on .values() rows instead of model instances.
+
+    Subclasses name the columns they read and build plain dicts with the
+    same keys, in the same order, as the DRF serializer they stand in for,
+    so the rendered JSON does not change.
+    """
+
+    fields = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def get_rows(self, queryset):
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def instance_rows(self, instances):
+        return [{field: getattr(instance, field) for field in self.fields} for instance in instances]
+
+    def to_representation(self, row):
+        return row
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class TagRows(RowSerializer):
+    fields = ('id', 'name', 'color', 'slug')
+
+
+class IngredientRows(RowSerializer):
+    fields = ('id', 'name', 'measurement_unit')
+
+
+class UserRows(RowSerializer):
+    fields = ('email', 'username', 'first_name', 'last_name', 'id')
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.following = set(self.context.get('following', ()))
+
+    def to_representation(self, row):
+        return {**row, 'is_subscribed': row['id'] in self.following}
+
+
+class RecipeRows(RowSerializer):
+    """Rows of RecipeSerializer; tags and ingredients are fetched per page."""
+
+    fields = (
+        'id', 'pub_date', 'name', 'text', 'cooking_time', 'image', 'is_favorited', 'is_in_shopping_cart',
+        'author', 'author__email', 'author__username', 'author__first_name', 'author__last_name',
+    )
+    variant = 'full'
+    storage = Recipe._meta.get_field('image').storage
+
+    def get_rows(self, queryset):
+        return queryset.prefetch_related(None).values(
+            *self.fields, 'processed_image', f'processed_image__{self.variant}'
+        )
+
+    def get_author(self, row):
+        if row['author'] is None:
+            return CustomUserSerializer(instance=None).data
+        # RecipeSerializer serializes the author without context, so
+        # is_subscribed is always false here.
+        return {
+            'email': row['author__email'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'id': row['author'],
+            'is_subscribed': False,
+        }
+
+    def get_image(self, row):
+        if row['processed_image'] is not None:
+            name = row[f'processed_image__{self.variant}']
+        else:
+            name = row['image']
+        if not name:
+            return None
+        url = self.storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_extra_fields(self, row):
+        return {}
+
+    def serialize(self, rows):
+        rows = list(rows)
+        recipe_ids = [row['id'] for row in rows]
+        if not recipe_ids:
+            return []
+        self.tags = group_rows(Tag.objects.filter(recipes__in=recipe_ids).values_list(
+            'recipes', 'id', 'name', 'color', 'slug'
+        ))
+        self.ingredients = group_rows(IngredientAmount.objects.filter(recipe__in=recipe_ids).values_list(
+            'recipe', 'amount', 'ingredient__name', 'ingredient__measurement_unit', 'ingredient'
+        ))
+        return super().serialize(rows)
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+            'author': self.get_author(row),
+            'tags': [
+                {'id': pk, 'name': name, 'color': color, 'slug': slug}
+                for pk, name, color, slug in self.tags.get(row['id'], ())
+            ],
+            'ingredients': [
+                {'amount': amount, 'name': name, 'measurement_unit': measurement_unit, 'id': pk}
+                for amount, name, measurement_unit, pk in self.ingredients.get(row['id'], ())
+            ],
+            'image': self.get_image(row),
+            **self.get_extra_fields(row),
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        }
+
+
+class RecipeListRows(RecipeRows):
+    variant = 'card'
+
+
+class RecipeMatchRows(RecipeListRows):
+    def get_extra_fields(self, row):
+        matched, total = self.context['matches'][row['id']]
+        return {'matched': matched, 'missing': total - matched, 'coverage': round(matched / total, 4)}
+
+
+class FastReadMixin:
+    """Serves reads from row serializers and renders them with orjson.
+
+    Views opt in by setting row_serializer_class and keep fast_read to
+    switch back to the DRF serializers without touching anything else.
+    """
+
+    fast_read = True
+    row_serializer_class = None
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_row_serializer_class(self):
+        return self.row_serializer_class
+
+    def use_fast_read(self):
+        return self.fast_read and self.get_row_serializer_class() is not None
+
+    def get_row_serializer(self, context=None):
+        if context is None:
+            context = self.get_serializer_context()
+        return self.get_row_serializer_class()(context=context)
+
+    def fast_list(self, queryset, context=None):
+        serializer = self.get_row_serializer(context)
+        rows = serializer.get_rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(data=serializer.serialize(rows), status=status.HTTP_200_OK)
+
+    def fast_retrieve(self, context=None):
+        serializer = self.get_row_serializer(context)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            serializer.get_rows(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, row)
+        return Response(data=serializer.serialize([row])[0], status=status.HTTP_200_OK)
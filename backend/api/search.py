@@ -0,0 +1,142 @@
+import re
+from collections import Counter
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, Subquery, Sum,
+                              Value)
+
+from recipes.models import IngredientAmount, Recipe, RecipeSearchTerm
+
+WORD = re.compile(r'\w+')
+MIN_STEM = 3
+REFLEXIVE_ENDINGS = ('ся', 'сь')
+RUSSIAN_ENDINGS = tuple(sorted({
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ейте', 'уйте', 'ите', 'или', 'ыли', 'ила', 'ыла', 'ена', 'ило', 'ыло', 'ено', 'ует', 'уют',
+    'ить', 'ыть', 'ишь', 'ешь', 'ете', 'нно',
+    'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ый', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях',
+    'ию', 'ью', 'ия', 'ья', 'ее', 'ые', 'ое', 'им', 'ым', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою',
+    'ею', 'ла', 'на', 'ли', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ят', 'ит', 'ыт', 'ил', 'ыл', 'ен',
+    'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+}, key=len, reverse=True))
+ENGLISH_ENDINGS = ('ing', 'ies', 'es', 'ed', 's')
+FIELD_WEIGHTS = (('name', 4), ('text', 1))
+POSTGRES_CONFIG = 'russian'
+
+
+def strip_ending(word, endings):
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def stem(word):
+    """Light suffix-stripping stemmer, good enough to match word forms."""
+    word = word.casefold().replace('ё', 'е')
+    if word.isascii():
+        return strip_ending(word, ENGLISH_ENDINGS)
+    return strip_ending(strip_ending(word, REFLEXIVE_ENDINGS), RUSSIAN_ENDINGS)
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text) if len(word) > 1 and not word.isdigit()]
+
+
+class PostgresSearch:
+    """Stored tsvector of name and text, matched through a GIN index."""
+
+    vector = (
+        SearchVector('name', weight='A', config=POSTGRES_CONFIG)
+        + SearchVector('text', weight='B', config=POSTGRES_CONFIG)
+    )
+
+    def index(self, recipe_ids):
+        Recipe.objects.filter(pk__in=recipe_ids).update(search_vector=self.vector)
+
+    def search(self, queryset, text):
+        query = SearchQuery(text, config=POSTGRES_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+
+
+class InvertedIndexSearch:
+    """Term to recipe table for databases without full-text search.
+
+    Recipes must contain every term of the query and are ranked by the
+    weighted number of occurrences, name matches counting more than text.
+    """
+
+    def index(self, recipe_ids):
+        terms = []
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids).values('pk', *dict(FIELD_WEIGHTS)):
+            weights = Counter()
+            for field, weight in FIELD_WEIGHTS:
+                for term in tokenize(recipe[field]):
+                    weights[term[:100]] += weight
+            terms.extend(
+                RecipeSearchTerm(recipe_id=recipe['pk'], term=term, weight=weight)
+                for term, weight in weights.items()
+            )
+        with transaction.atomic():
+            RecipeSearchTerm.objects.filter(recipe__in=recipe_ids).delete()
+            RecipeSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+    def search(self, queryset, text):
+        terms = set(tokenize(text))
+        if not terms:
+            # Short words and numbers are not indexed; annotated so the result can still be ordered by rank.
+            return queryset.none().annotate(search_rank=Value(0, output_field=IntegerField()))
+        matches = RecipeSearchTerm.objects.filter(term__in=terms).values('recipe').annotate(
+            matched=Count('pk'), score=Sum('weight')
+        ).filter(matched=len(terms))
+        return queryset.filter(pk__in=matches.values('recipe')).annotate(
+            search_rank=Subquery(matches.filter(recipe=OuterRef('pk')).values('score'))
+        )
+
+
+def get_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearch()
+    return InvertedIndexSearch()
+
+
+def index_recipes(recipe_ids):
+    get_backend().index(recipe_ids)
+
+
+def rebuild_search_index(batch_size=1000):
+    backend = get_backend()
+    recipe_ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    total, batch = 0, []
+    for recipe_id in recipe_ids.iterator():
+        batch.append(recipe_id)
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        backend.index(batch)
+        total += len(batch)
+    return total
+
+
+def search_recipes(queryset, text):
+    return get_backend().search(queryset, text).order_by('-search_rank', '-pub_date', '-id')
+
+
+def with_all_ingredients(queryset, ingredient_ids):
+    ingredient_ids = {int(ingredient_id) for ingredient_id in ingredient_ids}
+    recipes = IngredientAmount.objects.filter(ingredient__in=ingredient_ids).values('recipe').annotate(
+        matched=Count('ingredient', distinct=True)
+    ).filter(matched=len(ingredient_ids))
+    return queryset.filter(pk__in=recipes.values('recipe'))
+
+
+def without_ingredients(queryset, ingredient_ids):
+    return queryset.exclude(
+        pk__in=IngredientAmount.objects.filter(ingredient__in=ingredient_ids).values('recipe')
+    )
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
@@ -62,32 +63,42 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('amount', 'name', 'measurement_unit', 'id')
 
 
+class RecipeImageField(serializers.ImageField):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs.update({'source': '*', 'read_only': True})
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        processed = recipe.processed_image
+        image = getattr(processed, self.variant) if processed is not None else recipe.image
+        return super().to_representation(image)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     author = serializers.SerializerMethodField()
     tags = TagSerializer(many=True)
     ingredients = serializers.SerializerMethodField()
-    image = serializers.ImageField(use_url=True)
+    image = RecipeImageField(variant='full', use_url=True)
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date', )
+        exclude = ('pub_date', 'processed_image', 'favorites_count', 'shopping_count', 'search_vector')
 
     def get_ingredients(self, obj):
-        ingredients = IngredientAmount.objects.filter(recipe=obj)
+        ingredients = obj.ingredient_amounts.all()
         return IngredientAmountSerializer(ingredients, many=True).data
 
     def get_author(self, obj):
         return CustomUserSerializer(instance=obj.author).data
 
     def get_is_favorited(self, obj):
-        following = self.context.get('following', [])
-        return obj.id in following
+        return getattr(obj, 'is_favorited', False)
 
     def get_is_in_shopping_cart(self, obj):
-        shopping = self.context.get('shopping', [])
-        return obj.id in shopping
+        return getattr(obj, 'is_in_shopping_cart', False)
 
 
 class RecipeCreateUpdateSerializer(RecipeSerializer):
@@ -96,23 +107,43 @@ class RecipeCreateUpdateSerializer(RecipeSerializer):
     ingredients = IngredientAmountSerializer(many=True)
     author = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
+    @transaction.atomic
     def save(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         ingredients = [_ for _ in ingredients if _['amount'] > 0]
         if len(ingredients) < 1:
             raise ValidationError({'ingredients': 'At least one ingredient amount must be > 0'})
+        amounts = {ing['ingredient']['id']: ing['amount'] for ing in ingredients}
+        found = Ingredient.objects.in_bulk(list(amounts))
+        missing = sorted(set(amounts) - set(found))
+        if missing:
+            raise ValidationError({'ingredients': f'Ingredients do not exist: {missing}'})
+        if self.instance is not None and 'image' in validated_data:
+            self.instance.processed_image = None
         instance = super().save()
-        IngredientAmount.objects.filter(recipe=instance).delete()
-        for ing in ingredients:
-            amount = ing['amount']
-            ingredient = Ingredient.objects.get(id=ing['ingredient']['id'])
-            obj, created = IngredientAmount.objects.update_or_create(
-                recipe=instance,
-                ingredient=ingredient,
-                defaults={'amount': amount}
-            )
+        self.save_ingredient_amounts(instance, amounts)
         return instance
 
+    def save_ingredient_amounts(self, recipe, amounts):
+        recipe_amounts = IngredientAmount.objects.filter(recipe=recipe)
+        recipe_amounts.exclude(ingredient_id__in=list(amounts)).delete()
+        existing = {
+            obj.ingredient_id: obj
+            for obj in recipe_amounts.filter(ingredient_id__in=list(amounts))
+        }
+        to_create, to_update = [], []
+        for ingredient_id, amount in amounts.items():
+            obj = existing.get(ingredient_id)
+            if obj is None:
+                to_create.append(IngredientAmount(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif obj.amount != amount:
+                obj.amount = amount
+                to_update.append(obj)
+        IngredientAmount.objects.bulk_create(to_create)
+        IngredientAmount.objects.bulk_update(to_update, ['amount'])
+
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
 
@@ -127,7 +158,29 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeListSerializer(RecipeSerializer):
+    image = RecipeImageField(variant='card', use_url=True)
+
+
+class RecipeMatchSerializer(RecipeListSerializer):
+    matched = serializers.SerializerMethodField()
+    missing = serializers.SerializerMethodField()
+    coverage = serializers.SerializerMethodField()
+
+    def get_matched(self, obj):
+        return self.context['matches'][obj.pk][0]
+
+    def get_missing(self, obj):
+        matched, total = self.context['matches'][obj.pk]
+        return total - matched
+
+    def get_coverage(self, obj):
+        matched, total = self.context['matches'][obj.pk]
+        return round(matched / total, 4)
+
+
 class RecipeShortSerializer(RecipeSerializer):
+    image = RecipeImageField(variant='thumbnail', use_url=True)
 
     class Meta:
         model = Recipe
@@ -149,15 +202,29 @@ class FollowUserCreateSerializer(serializers.ModelSerializer):
 
 class FollowUserSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ('email', 'username', 'first_name', 'last_name', 'id', 'is_subscribed', 'recipes')
+        fields = (
+            'email', 'username', 'first_name', 'last_name', 'id', 'is_subscribed', 'recipes', 'recipes_count'
+        )
 
     def get_recipes(self, obj):
-        author_recipes = obj.recipes.all()[:self.context.get('recipes_limit', 2)]
+        recipes = self.context.get('recipes')
+        if recipes is not None:
+            author_recipes = recipes.get(obj.pk, [])
+        else:
+            author_recipes = obj.recipes.all()[:self.context.get('recipes_limit', 2)]
         return RecipeShortSerializer(author_recipes, many=True).data
 
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        if hasattr(obj, 'stats'):
+            return obj.stats.recipes_count
+        return obj.recipes.count()
+
 
 class ShoppingRecipeSerializer(serializers.ModelSerializer):
 
@@ -0,0 +1,189 @@
+import csv
+import json
+import threading
+import weakref
+
+from django.db import transaction
+from django.db.models import (Case, Count, F, PositiveBigIntegerField, Sum,
+                              Value, When)
+
+from recipes.models import IngredientAmount, ShoppingListItem, ShoppingRecipe
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    # Ingredients sharing a name and unit are listed once, as before the list was stored.
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('total')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def lock_users(user_ids):
+    """Serializes shopping list changes of these users until the transaction ends."""
+    list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+@transaction.atomic
+def change_cart(user_id, recipe_id, sign):
+    """Adds (sign=1) or subtracts (sign=-1) a recipe's ingredients to or from a user's list."""
+    amounts = dict(IngredientAmount.objects.filter(recipe=recipe_id).values_list('ingredient', 'amount'))
+    if not amounts:
+        return
+    lock_users([user_id])
+    items = ShoppingListItem.objects.filter(user=user_id, ingredient__in=list(amounts))
+    existing = set(items.values_list('ingredient', flat=True))
+    if existing:
+        delta = Case(
+            *(When(ingredient=ingredient, then=Value(amounts[ingredient])) for ingredient in existing),
+            output_field=PositiveBigIntegerField(),
+        )
+        items.update(total=F('total') + sign * delta, recipes=F('recipes') + sign)
+    if sign > 0:
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient, total=amount, recipes=1)
+            for ingredient, amount in amounts.items() if ingredient not in existing
+        ])
+    else:
+        items.filter(recipes__lte=0).delete()
+
+
+def aggregate_items(user_ids, ingredient_ids=None):
+    rows = IngredientAmount.objects.filter(recipe__shopping_recipe__user__in=user_ids)
+    if ingredient_ids is not None:
+        rows = rows.filter(ingredient__in=ingredient_ids)
+    rows = rows.values('recipe__shopping_recipe__user', 'ingredient').annotate(
+        total=Sum('amount'), recipes=Count('recipe')
+    ).order_by()
+    return [
+        ShoppingListItem(
+            user_id=row['recipe__shopping_recipe__user'], ingredient_id=row['ingredient'],
+            total=row['total'], recipes=row['recipes'],
+        )
+        for row in rows
+    ]
+
+
+def refresh_lists(user_ids, ingredient_ids=None):
+    """Recomputes the users' lists, or only the lines of the given ingredients, from their carts."""
+    user_ids = sorted(set(user_ids))
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            lock_users(batch)
+            items = ShoppingListItem.objects.filter(user__in=batch)
+            if ingredient_ids is not None:
+                items = items.filter(ingredient__in=ingredient_ids)
+            items.delete()
+            ShoppingListItem.objects.bulk_create(aggregate_items(batch, ingredient_ids), batch_size=BATCH_SIZE)
+
+
+def refresh_recipe(recipe_id, ingredient_ids=None):
+    """Recomputes the lists of users with the recipe in their cart after its ingredients changed."""
+    refresh_lists(
+        ShoppingRecipe.objects.filter(recipe=recipe_id).values_list('user', flat=True),
+        ingredient_ids,
+    )
+
+
+class PendingRefresh:
+    """Recipes whose ingredients changed in a transaction, each refreshed once when it commits.
+
+    A recipe maps to the ingredient ids of the changed lines, or to None when
+    the whole lists are recomputed; once run, recipes is None.
+    """
+
+    def __init__(self):
+        self.recipes = {}
+
+    def add(self, recipe_id, ingredient_ids=None):
+        if ingredient_ids is None or self.recipes.get(recipe_id, set()) is None:
+            self.recipes[recipe_id] = None
+        else:
+            self.recipes.setdefault(recipe_id, set()).update(ingredient_ids)
+
+    def __call__(self):
+        if self.recipes is None:
+            return
+        recipes, self.recipes = self.recipes, None
+        for recipe_id, ingredient_ids in recipes.items():
+            refresh_recipe(recipe_id, None if ingredient_ids is None else sorted(ingredient_ids))
+
+
+_pending = weakref.WeakKeyDictionary()
+_pending_lock = threading.Lock()
+
+
+def refresh_recipe_on_commit(recipe_id, ingredient_ids=None):
+    """Schedules refresh_recipe for the end of the transaction, merged with the recipe's other changes.
+
+    Every change registers the connection's shared PendingRefresh with
+    on_commit, and only its first run does the work, so a rolled back
+    savepoint cannot drop the changes made outside it. After a rolled back
+    transaction the next one also refreshes its recipes, which is harmless.
+    """
+    connection = transaction.get_connection()
+    with _pending_lock:
+        pending = _pending.get(connection)
+        if pending is None or pending.recipes is None:
+            pending = _pending[connection] = PendingRefresh()
+    pending.add(recipe_id, ingredient_ids)
+    transaction.on_commit(pending)
+
+
+@transaction.atomic
+def rebuild_shopping_lists(users=None):
+    """Rewrites shopping lists from carts, e.g. after bulk loads that bypass signals."""
+    if users is None:
+        ShoppingListItem.objects.all().delete()
+        users = ShoppingRecipe.objects.values_list('user', flat=True).distinct()
+    refresh_lists(users)
+
+
+def iter_items(items):
+    for item in items.iterator():
+        yield (
+            item['ingredient__name'].capitalize(),
+            item['total_amount'],
+            item['ingredient__measurement_unit'],
+        )
+
+
+def render_txt(items):
+    for name, amount, unit in iter_items(items):
+        yield f'{name} - {amount} {unit}\n'
+
+
+def render_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in iter_items(items):
+        yield writer.writerow(row)
+
+
+def render_json(items):
+    separator = '['
+    for name, amount, unit in iter_items(items):
+        yield separator + json.dumps(
+            {'name': name, 'amount': amount, 'measurement_unit': unit},
+            ensure_ascii=False,
+        )
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'json': ('application/json', render_json),
+}
@@ -0,0 +1,150 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.autocomplete import ingredient_index
+from api.cache import recipe_cache, table_versions
+from api.matching import recipe_ingredient_index
+from api.search import index_recipes
+from api.shopping_list import change_cart, refresh_recipe_on_commit
+from api.timeline import backfill, fan_out, remove
+from recipes.images import schedule_recipe_image
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingRecipe, Tag)
+from users.models import FollowUser, UserStats
+
+User = get_user_model()
+
+TABLES = {
+    Ingredient: 'ingredients',
+    IngredientAmount: 'recipes',
+    Recipe: 'recipes',
+    Recipe.tags.through: 'recipes',
+    Tag: 'tags',
+    User: 'users',
+    FavoriteRecipe: 'favorites',
+    ShoppingRecipe: 'shopping',
+    FollowUser: 'follows',
+}
+
+RECIPE_CACHE_TABLES = {'ingredients', 'recipes', 'tags', 'users'}
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def revoke_user_tokens(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if created or raw or update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    keys = list(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    if keys:
+        transaction.on_commit(partial(token_cache.revoke, keys))
+
+
+@receiver(post_delete, sender=Token)
+def revoke_token(sender, instance, **kwargs):
+    transaction.on_commit(partial(token_cache.revoke, [instance.key]))
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, raw=False, **kwargs):
+    if raw or instance.processed_image_id is not None or not instance.image:
+        return
+    transaction.on_commit(partial(schedule_recipe_image, instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(partial(fan_out, instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields is not None and not {'name', 'text'} & set(update_fields):
+        return
+    transaction.on_commit(partial(index_recipes, [instance.pk]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_ingredients_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields is not None:
+        return
+    transaction.on_commit(partial(recipe_ingredient_index.note_change, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=IngredientAmount)
+def ingredient_amount_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(recipe_ingredient_index.note_change, instance.recipe_id))
+
+
+@receiver(post_save, sender=ShoppingRecipe)
+def add_to_shopping_list(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        change_cart(instance.user_id, instance.recipe_id, 1)
+
+
+@receiver(pre_delete, sender=ShoppingRecipe)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # Before the delete, while a cascade from the recipe has not removed its amounts yet.
+    change_cart(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_shopping_lists(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Amounts are saved in bulk after the recipe, so the lists are refreshed once the transaction commits.
+    if created or raw or update_fields is not None:
+        return
+    refresh_recipe_on_commit(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=IngredientAmount)
+def refresh_shopping_list_lines(sender, instance, raw=False, **kwargs):
+    # Covers amounts edited on their own, e.g. in the admin; a recipe's changed lines are refreshed together.
+    if not raw:
+        refresh_recipe_on_commit(instance.recipe_id, [instance.ingredient_id])
+
+
+@receiver(post_save, sender=FollowUser)
+def backfill_timeline(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=FollowUser)
+def clear_timeline(sender, instance, **kwargs):
+    remove(instance.user_id, instance.author_id)
+
+
+def table_changed(sender, update_fields=None, action=None, **kwargs):
+    if action is not None and not action.startswith('post_'):
+        return
+    if sender is User and update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    table = TABLES[sender]
+    transaction.on_commit(partial(table_versions.bump, table))
+    if table in RECIPE_CACHE_TABLES:
+        transaction.on_commit(recipe_cache.invalidate)
+
+
+for model in TABLES:
+    signals = [m2m_changed] if model is Recipe.tags.through else [post_save, post_delete]
+    for signal in signals:
+        signal.connect(table_changed, sender=model)
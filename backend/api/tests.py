@@ -0,0 +1,937 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import renderers, urls, views
+from api.async_views import ASGIHandler, async_urlpatterns
+from api.authentication import TokenCache, token_cache
+from api.autocomplete import IngredientIndex
+from api.cache import ResponseCache, recipe_cache, table_versions
+from api.checks import (check_metrics_store, check_replica_pins,
+                        check_response_cache)
+from api.counters import change_recipe_counter, reconcile_recipes, reconcile_users
+from api.matching import RecipeIngredientIndex
+from api.metrics import MetricsRegistry, QueryRecorder
+from api.ranking import decay, update_rankings
+from api.rows import FastReadMixin
+from api.search import index_recipes, stem, tokenize
+from api.shopping_list import aggregate_items
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            RankingRun, Recipe, RecipeRank, ShoppingListItem,
+                            Tag, TimelineEntry)
+from users.models import FollowUser, User, UserStats
+
+IMAGE = 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+
+
+class APITestMixin:
+    """Users, tags and ingredients shared by the API tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='password',
+            first_name='Author', last_name='Author',
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='password',
+            first_name='Reader', last_name='Reader',
+        )
+        cls.tags = [Tag.objects.create(name=f'Tag {i}', slug=f'tag{i}') for i in range(2)]
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'ingredient {i:02}', measurement_unit='g') for i in range(40)
+        ])
+        cls.ingredients = list(Ingredient.objects.order_by('pk'))
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        caches['default'].clear()
+        token_cache.revoke_all()
+        self.anon = APIClient()
+        self.client = self.client_for(self.reader)
+
+    def client_for(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def create_recipe(self, ingredients=1, author=None, **kwargs):
+        recipe = Recipe.objects.create(
+            author=author or self.author, name=kwargs.pop('name', 'Recipe'), text=kwargs.pop('text', 'Text'),
+            image='', cooking_time=10, **kwargs
+        )
+        recipe.tags.set(self.tags)
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(recipe=recipe, ingredient=ingredient, amount=index + 1)
+            for index, ingredient in enumerate(self.ingredients[:ingredients])
+        ])
+        return recipe
+
+
+class RecipeReadQueriesTest(APITestMixin, TestCase):
+    """The recipe list and detail run a fixed number of queries."""
+
+    def assertListQueries(self, client, num, page_sizes=(1, 5, 20)):
+        # Authenticates once so the token is in the token cache.
+        client.get('/api/tags/')
+        for limit in page_sizes:
+            caches['default'].clear()
+            with self.subTest(limit=limit), self.assertNumQueries(num):
+                response = client.get('/api/recipes/', {'limit': limit})
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_list_queries_do_not_grow_with_page_size_or_ingredients(self):
+        for ingredients in (1, 10, 40):
+            Recipe.objects.all().delete()
+            for index in range(20):
+                self.create_recipe(ingredients=ingredients, name=f'Recipe {index}')
+            with self.subTest(ingredients=ingredients):
+                # Count, page, tags, ingredient amounts.
+                self.assertListQueries(self.anon, 4)
+                # The user's favorite and cart flags are part of the page query.
+                self.assertListQueries(self.client, 4)
+
+    def test_retrieve_queries_do_not_grow_with_ingredients(self):
+        for ingredients in (1, 40):
+            recipe = self.create_recipe(ingredients=ingredients)
+            with self.subTest(ingredients=ingredients), self.assertNumQueries(3):
+                response = self.anon.get(f'/api/recipes/{recipe.pk}/')
+            self.assertEqual(len(response.json()['ingredients']), ingredients)
+
+
+class RecipeWriteQueriesTest(APITestMixin, TestCase):
+    """Saving a recipe runs a fixed number of queries whatever its ingredient count."""
+
+    def payload(self, ingredients, offset=0, amount=5):
+        return {
+            'name': 'Recipe', 'text': 'Text', 'cooking_time': 10, 'image': IMAGE,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient in self.ingredients[offset:offset + ingredients]
+            ],
+        }
+
+    def test_create_and_update_queries_do_not_grow_with_ingredients(self):
+        client = self.client_for(self.author)
+        client.get('/api/tags/')
+        for ingredients in (2, 6, 20):
+            with self.subTest(ingredients=ingredients):
+                with self.assertNumQueries(19):
+                    response = client.post('/api/recipes/', self.payload(ingredients), format='json')
+                self.assertEqual(response.status_code, 201)
+                recipe_id = response.json()['id']
+                self.assertEqual(len(response.json()['ingredients']), ingredients)
+                # Keeps half of the ingredients with a new amount and replaces the rest.
+                with self.assertNumQueries(18):
+                    response = client.put(
+                        f'/api/recipes/{recipe_id}/',
+                        self.payload(ingredients, offset=ingredients // 2, amount=7),
+                        format='json',
+                    )
+                self.assertEqual(response.status_code, 200)
+                amounts = IngredientAmount.objects.filter(recipe=recipe_id)
+                self.assertEqual(
+                    sorted(amounts.values_list('ingredient', flat=True)),
+                    [ingredient.pk for ingredient in self.ingredients[ingredients // 2:ingredients // 2 + ingredients]],
+                )
+                self.assertEqual(set(amounts.values_list('amount', flat=True)), {7})
+
+
+class FastReadTest(APITestMixin, TestCase):
+    """Row serializers rendered with orjson give the same bytes as DRF serializers and JSONRenderer."""
+
+    def setUp(self):
+        super().setUp()
+        client = self.client_for(self.author)
+        payload = {
+            'name': 'With image', 'text': 'Text', 'cooking_time': 10, 'image': IMAGE,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [{'id': ingredient.pk, 'amount': 3} for ingredient in self.ingredients[:3]],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/recipes/', payload, format='json').status_code, 201)
+        self.recipes = [self.create_recipe(ingredients=count, name=f'Recipe {count}') for count in (1, 4)]
+        self.recipes.append(self.create_recipe(author=self.reader, name='Борщ «дня»'))
+        FavoriteRecipe.objects.create(user=self.reader, recipe=self.recipes[0])
+        FollowUser.objects.create(user=self.reader, author=self.author)
+
+    def get_bytes(self, path, fast):
+        caches['default'].clear()
+        with mock.patch.object(FastReadMixin, 'fast_read', fast), \
+                mock.patch('api.renderers.orjson', renderers.orjson if fast else None):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response.content
+
+    def test_responses_match_drf(self):
+        recipe = self.recipes[0]
+        for path in (
+            '/api/recipes/', '/api/recipes/?limit=2&page=2', f'/api/recipes/{recipe.pk}/',
+            '/api/recipes/?is_favorited=1', '/api/recipes/?cursor=',
+            '/api/users/subscriptions/', '/api/users/subscriptions/?recipes_limit=1',
+            '/api/users/', f'/api/users/{self.author.pk}/', '/api/tags/', '/api/ingredients/',
+            '/api/ingredients/?name=ingredient 1',
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.get_bytes(path, fast=True), self.get_bytes(path, fast=False))
+
+
+class RecipeCacheTest(APITestMixin, TestCase):
+    """Anonymous recipe reads are cached until a change is committed."""
+
+    def test_anonymous_list_is_served_from_cache(self):
+        self.create_recipe()
+        response = self.anon.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.anon.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_committed_change_invalidates_cached_responses(self):
+        recipe = self.create_recipe()
+        self.anon.get('/api/recipes/')
+        self.anon.get(f'/api/recipes/{recipe.pk}/')
+        recipe.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        for path in ('/api/recipes/', f'/api/recipes/{recipe.pk}/'):
+            response = self.anon.get(path)
+            self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Renamed')
+        self.assertEqual(self.anon.get('/api/recipes/').json()['results'][0]['name'], 'Renamed')
+
+    def test_authenticated_reads_are_not_cached(self):
+        self.create_recipe()
+        self.client.get('/api/recipes/')
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-Cache', response)
+
+    def test_hits_and_misses_reach_other_processes(self):
+        recipe_cache.reset_stats()
+        self.create_recipe()
+        for _ in range(3):
+            self.anon.get('/api/recipes/')
+        recipe_cache.flush()
+        # A fresh instance stands in for the recipe_cache command's process.
+        stats = ResponseCache('recipes').stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        out = StringIO()
+        call_command('recipe_cache', stdout=out)
+        self.assertIn('hits: 2', out.getvalue())
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        response = self.client_for(admin).get('/api/metrics/')
+        self.assertIn('foodgram_response_cache_hits_total 2', response.content.decode())
+
+
+class ConditionalGetTest(APITestMixin, TestCase):
+    """Read endpoints answer a current ETag with 304 and change it with the data."""
+
+    def test_current_etag_gets_not_modified_without_queries(self):
+        recipe = self.create_recipe()
+        for client in (self.anon, self.client):
+            for path in ('/api/recipes/', f'/api/recipes/{recipe.pk}/', '/api/tags/', '/api/ingredients/'):
+                with self.subTest(path=path):
+                    response = client.get(path)
+                    self.assertIn('Last-Modified', response)
+                    with self.assertNumQueries(0):
+                        response = client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+                    self.assertEqual(response.status_code, 304)
+
+    def test_etags_differ_between_users(self):
+        self.create_recipe()
+        self.assertNotEqual(self.anon.get('/api/recipes/')['ETag'], self.client.get('/api/recipes/')['ETag'])
+
+    def test_committed_change_replaces_etag(self):
+        recipe = self.create_recipe()
+        etag = self.client.get(f'/api/recipes/{recipe.pk}/')['ETag']
+        tags_etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.reader, recipe=recipe)
+        response = self.client.get(f'/api/recipes/{recipe.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.json()['is_favorited'])
+        # Tags do not depend on favorites.
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=tags_etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_are_not_conditional(self):
+        recipe = self.create_recipe()
+        etag = self.client.get(f'/api/recipes/{recipe.pk}/')['ETag']
+        response = self.client.get(f'/api/recipes/{recipe.pk}/favorite/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class CursorPaginationTest(APITestMixin, TestCase):
+    """?cursor= pages by keys, so rows added meanwhile neither repeat nor shift pages."""
+
+    def collect(self, client, url):
+        pages = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.json()['results']])
+            url = response.json()['next']
+        return pages
+
+    def test_recipe_pages_follow_publication_order(self):
+        recipes = [self.create_recipe(name=f'Recipe {index}') for index in range(7)]
+        pages = self.collect(self.anon, '/api/recipes/?cursor=&limit=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        expected = list(Recipe.objects.order_by('-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(set(expected), {recipe.pk for recipe in recipes})
+
+    def test_new_recipes_do_not_shift_later_pages(self):
+        for index in range(6):
+            self.create_recipe(name=f'Recipe {index}')
+        response = self.anon.get('/api/recipes/', {'cursor': '', 'limit': 3})
+        first = [item['id'] for item in response.json()['results']]
+        self.create_recipe(name='Newer')
+        caches['default'].clear()
+        second = self.collect(self.anon, response.json()['next'])
+        self.assertEqual(len(first + sum(second, [])), 6)
+        self.assertFalse(set(first) & set(sum(second, [])))
+
+    def test_subscription_pages(self):
+        authors = [
+            User.objects.create_user(username=f'user{index}', email=f'user{index}@example.com', password='password')
+            for index in range(5)
+        ]
+        FollowUser.objects.bulk_create([FollowUser(user=self.reader, author=author) for author in authors])
+        pages = self.collect(self.client, '/api/users/subscriptions/?cursor=&limit=2')
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), [author.pk for author in authors])
+
+    def test_page_numbers_stay_the_default(self):
+        self.create_recipe()
+        self.assertEqual(self.anon.get('/api/recipes/').json()['count'], 1)
+
+
+class SubscriptionRecipesTest(APITestMixin, TestCase):
+    """Subscriptions list the newest recipes_limit recipes of each author in one query."""
+
+    def follow(self, count):
+        authors = []
+        start = FollowUser.objects.filter(user=self.reader).count()
+        for index in range(start, start + count):
+            author = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com', password='password'
+            )
+            for number in range(4):
+                self.create_recipe(author=author, name=f'Recipe {number}')
+            FollowUser.objects.create(user=self.reader, author=author)
+            authors.append(author)
+        return authors
+
+    def test_newest_recipes_per_author(self):
+        authors = self.follow(2)
+        response = self.client.get('/api/users/subscriptions/', {'recipes_limit': 2})
+        for author, item in zip(authors, response.json()['results']):
+            newest = author.recipes.order_by('-pub_date', '-id').values_list('id', flat=True)[:2]
+            self.assertEqual([recipe['id'] for recipe in item['recipes']], list(newest))
+        response = self.client.get('/api/users/subscriptions/', {'recipes_limit': 0})
+        self.assertEqual([item['recipes'] for item in response.json()['results']], [[], []])
+
+    def test_queries_do_not_grow_with_authors(self):
+        self.client.get('/api/tags/')
+        for count in (1, 5):
+            self.follow(count)
+            caches['default'].clear()
+            # Count, authors page, recipes of all authors on the page.
+            with self.subTest(count=count), self.assertNumQueries(3):
+                self.client.get('/api/users/subscriptions/', {'limit': 10, 'recipes_limit': 3})
+
+    def test_recipes_query_skips_unused_columns(self):
+        self.follow(2)
+        self.client.get('/api/tags/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/subscriptions/', {'recipes_limit': 2})
+        self.assertEqual(len(response.json()['results'][0]['recipes']), 2)
+        recipes_sql = queries[-1]['sql']
+        self.assertIn('recipe_rank', recipes_sql)
+        self.assertNotIn('search_vector', recipes_sql)
+        self.assertNotIn('*', recipes_sql)
+
+
+class MetricsStoreTest(SimpleTestCase):
+    """Metrics flushed by one process are read by another, like metrics_report."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        settings = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'metrics': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.location},
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_collect_merges_flushed_snapshots(self):
+        worker = MetricsRegistry()
+        recorder = QueryRecorder()
+        recorder.count = 3
+        worker.record('RecipeViewSet.list', 0.02, recorder)
+        worker.record('RecipeViewSet.list', 0.2, recorder)
+        with self.assertLogs('api.metrics', 'INFO'):
+            worker.flush()
+        report = MetricsRegistry().collect()
+        self.assertEqual(report['RecipeViewSet.list']['count'], 2)
+        self.assertEqual(report['RecipeViewSet.list']['queries'], 6)
+
+    def test_empty_registry_does_not_overwrite_snapshots(self):
+        worker = MetricsRegistry()
+        worker.record('TagViewSet.list', 0.01, QueryRecorder())
+        with self.assertLogs('api.metrics', 'INFO'):
+            worker.flush()
+        MetricsRegistry().flush()
+        self.assertEqual(MetricsRegistry().collect()['TagViewSet.list']['count'], 1)
+
+    def test_local_memory_store_is_reported(self):
+        self.assertEqual(check_metrics_store(None), [])
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'metrics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }):
+            self.assertEqual([warning.id for warning in check_metrics_store(None)], ['api.W001'])
+
+
+class CountersTest(APITestMixin, TestCase):
+    """Favorites, cart, recipe and follower counters follow the API writes."""
+
+    def test_relation_counters(self):
+        recipe = self.create_recipe()
+        self.client.get(f'/api/recipes/{recipe.pk}/favorite/')
+        self.client.get(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.client_for(self.author).get(f'/api/recipes/{recipe.pk}/favorite/')
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.favorites_count, recipe.shopping_count), (2, 1))
+        self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.favorites_count, recipe.shopping_count), (1, 1))
+
+    def test_user_counters(self):
+        self.client.get(f'/api/users/{self.author.pk}/subscribe/')
+        response = self.client_for(self.author).post('/api/recipes/', {
+            'name': 'Recipe', 'text': 'Text', 'cooking_time': 10, 'image': IMAGE,
+            'tags': [self.tags[0].pk], 'ingredients': [{'id': self.ingredients[0].pk, 'amount': 1}],
+        }, format='json')
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual((stats.recipes_count, stats.followers_count), (1, 1))
+        self.client_for(self.author).delete(f'/api/recipes/{response.json()["id"]}/')
+        self.client.delete(f'/api/users/{self.author.pk}/subscribe/')
+        stats.refresh_from_db()
+        self.assertEqual((stats.recipes_count, stats.followers_count), (0, 0))
+
+    def test_updates_are_relative_and_never_negative(self):
+        recipe = self.create_recipe()
+        stale = Recipe.objects.get(pk=recipe.pk)
+        change_recipe_counter(recipe.pk, 'favorites_count', 1)
+        change_recipe_counter(stale.pk, 'favorites_count', 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 2)
+        for _ in range(3):
+            change_recipe_counter(recipe.pk, 'favorites_count', -1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        recipe = self.create_recipe()
+        FavoriteRecipe.objects.create(user=self.reader, recipe=recipe)
+        Recipe.objects.filter(pk=recipe.pk).update(favorites_count=5)
+        UserStats.objects.filter(user=self.author).update(recipes_count=7)
+        self.assertEqual(reconcile_recipes(), 1)
+        self.assertEqual(reconcile_users(), 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.author).recipes_count, 1)
+        self.assertEqual(reconcile_recipes(dry_run=True), 0)
+
+
+@override_settings(FEED_FANOUT_MAX_RECIPES=5)
+class FeedTest(APITestMixin, TestCase):
+    """The feed pages over timeline entries and merges in recipes of pull authors."""
+
+    def setUp(self):
+        super().setUp()
+        self.pushed = User.objects.create_user(username='pushed', email='pushed@example.com', password='password')
+        self.pulled = User.objects.create_user(username='pulled', email='pulled@example.com', password='password')
+        for index in range(6):
+            self.create_recipe(author=self.pushed, name=f'Pushed {index}')
+            self.create_recipe(author=self.pulled, name=f'Pulled {index}')
+        self.create_recipe(author=self.author, name='Not followed')
+        UserStats.objects.filter(user=self.pushed).update(recipes_count=4)
+        UserStats.objects.filter(user=self.pulled).update(recipes_count=6)
+        for author in (self.pushed, self.pulled):
+            FollowUser.objects.create(user=self.reader, author=author)
+        self.expected = list(
+            Recipe.objects.filter(author__in=[self.pushed, self.pulled])
+            .order_by('-pub_date', '-id').values_list('id', flat=True)
+        )
+
+    def collect(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append([item['id'] for item in response.json()['results']])
+            url = response.json()['next']
+        return pages
+
+    def test_pages_merge_timeline_and_pull_authors(self):
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 6)
+        pages = self.collect('/api/recipes/feed/?cursor=&limit=5')
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get('/api/recipes/feed/', {'cursor': '', 'limit': 4}).json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+        self.assertEqual(back['next'], first['next'])
+
+    def test_queries_do_not_grow_with_depth(self):
+        self.client.get('/api/tags/')
+        url = '/api/recipes/feed/?cursor=&limit=3'
+        while url:
+            caches['default'].clear()
+            # Pull authors, timeline keys, pulled keys, recipes, tags, ingredient amounts.
+            with self.assertNumQueries(6):
+                url = self.client.get(url).json()['next']
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/recipes/feed/', {'cursor': 'invalid'}).status_code, 404)
+
+
+class StemmerTest(SimpleTestCase):
+    def test_word_forms_share_a_stem(self):
+        for words in (('пирог', 'пироги', 'Пирогами'), ('ежик', 'ёжики'), ('egg', 'eggs'), ('pie', 'pies')):
+            with self.subTest(words=words):
+                self.assertEqual({stem(word) for word in words}, {words[0].casefold()})
+
+    def test_short_stems_are_kept(self):
+        self.assertEqual(stem('суп'), 'суп')
+        self.assertEqual(stem('лук'), 'лук')
+
+    def test_short_words_numbers_and_punctuation_are_dropped(self):
+        self.assertEqual(tokenize('a 1 200 !! ?'), [])
+        self.assertEqual(tokenize('Суп, 2 яйца!'), ['суп', 'яйц'])
+
+
+class RankingTest(APITestMixin, TestCase):
+    """Rankings are updated incrementally from the last run stored in the database."""
+
+    def setUp(self):
+        super().setUp()
+        self.old, self.new = self.create_recipe(name='Old'), self.create_recipe(name='New')
+
+    def test_runs_add_only_new_events(self):
+        FavoriteRecipe.objects.create(user=self.reader, recipe=self.old)
+        first = timezone.now() + timedelta(seconds=1)
+        update_rankings(first)
+        self.assertEqual(RankingRun.objects.get().computed, first)
+        # A rebuild would drop the score of this event; an incremental run only decays it.
+        FavoriteRecipe.objects.filter(recipe=self.old).delete()
+        FavoriteRecipe.objects.create(user=self.reader, recipe=self.new)
+        FavoriteRecipe.objects.filter(recipe=self.new).update(created=first + timedelta(hours=1))
+        second = first + timedelta(hours=6)
+        update_rankings(second)
+        self.assertEqual(RankingRun.objects.get().computed, second)
+        trending = dict(RecipeRank.objects.values_list('recipe', 'trending'))
+        self.assertAlmostEqual(trending[self.old.pk], decay(timedelta(hours=6)), places=3)
+        self.assertAlmostEqual(trending[self.new.pk], decay(timedelta(hours=5)), places=3)
+
+    def test_run_invalidates_cached_pages_and_etags(self):
+        Recipe.objects.filter(pk=self.old.pk).update(favorites_count=1)
+        update_rankings()
+        url = '/api/recipes/?ordering=popular'
+        self.anon.get(url)
+        response = self.anon.get(url)
+        self.assertEqual((response['X-Cache'], response.json()['results'][0]['id']), ('HIT', self.old.pk))
+        etag = response['ETag']
+        Recipe.objects.filter(pk=self.new.pk).update(favorites_count=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_rankings()
+        response = self.anon.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['X-Cache'], response.json()['results'][0]['id']), ('MISS', self.new.pk))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_command_needs_a_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('rank_recipes')
+        self.assertFalse(RankingRun.objects.exists())
+
+
+class ImportIngredientsTest(APITestMixin, TestCase):
+    """Imports reach the web workers through the ingredients version in the shared cache."""
+
+    def write_catalog(self, items):
+        path = os.path.join(tempfile.mkdtemp(), 'ingredients.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(items, stream, ensure_ascii=False)
+        return path
+
+    def test_import_replaces_ingredient_etag(self):
+        path = self.write_catalog([
+            {'name': 'шафран', 'measurement_unit': 'г'},
+            {'name': 'ingredient 00', 'measurement_unit': 'g'},
+        ])
+        etag = self.anon.get('/api/ingredients/')['ETag']
+        self.assertEqual(self.anon.get('/api/ingredients/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        out = StringIO()
+        call_command('import_ingredients', path, stdout=out)
+        self.assertIn('created 1 ingredients', out.getvalue())
+        response = self.anon.get('/api/ingredients/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('шафран', [ingredient['name'] for ingredient in response.json()])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_command_needs_a_shared_cache(self):
+        path = self.write_catalog([{'name': 'шафран', 'measurement_unit': 'г'}])
+        with self.assertRaises(CommandError):
+            call_command('import_ingredients', path, stdout=StringIO())
+        self.assertFalse(Ingredient.objects.filter(name='шафран').exists())
+
+
+class IngredientIndexTest(APITestMixin, TestCase):
+    """Each worker's autocomplete index follows the shared ingredients version."""
+
+    def test_version_change_rebuilds_index(self):
+        index = IngredientIndex()
+        self.assertEqual(index.search('шафр'), [])
+        # As committed by another worker: no signal reaches this process, only the version.
+        Ingredient.objects.bulk_create([Ingredient(name='шафран', measurement_unit='г')])
+        self.assertEqual(index.search('шафр'), [])
+        table_versions.bump('ingredients')
+        self.assertEqual([ingredient.name for ingredient in index.search('шафр')], ['шафран'])
+
+    def test_unchanged_version_reuses_index(self):
+        index = IngredientIndex()
+        index.search('ingr')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(index.search('ingredient 1')), 10)
+
+
+class SearchTest(APITestMixin, TestCase):
+    """Search works on either backend: tsvector on Postgres, the term table elsewhere."""
+
+    def setUp(self):
+        super().setUp()
+        self.soup = self.create_recipe(name='Суп с грибами')
+        self.pie = self.create_recipe(name='Пирог', text='Пирог с грибами и луком')
+        self.salad = self.create_recipe(name='Салат', text='Огурцы и помидоры')
+        index_recipes([self.soup.pk, self.pie.pk, self.salad.pk])
+
+    def search(self, text):
+        response = self.anon.get('/api/recipes/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_name_matches_rank_before_text_matches(self):
+        self.assertEqual(self.search('грибы'), [self.soup.pk, self.pie.pk])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('пирог лук'), [self.pie.pk])
+        self.assertEqual(self.search('пирог огурцы'), [])
+
+    def test_queries_without_indexed_words_find_nothing(self):
+        for text in ('a', '1', '!!', '12 б'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), [])
+
+    def test_changes_are_indexed_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salad.name = 'Салат с грибами'
+            self.salad.save()
+        # Equal ranks keep the newest recipe first.
+        self.assertEqual(self.search('грибы'), [self.salad.pk, self.soup.pk, self.pie.pk])
+
+
+class WhatToCookTest(APITestMixin, TestCase):
+    """Matches are ranked by coverage and their ETag follows the user's relations."""
+
+    def setUp(self):
+        super().setUp()
+        # The index lives in the process and would outlast the rolled back recipes of other tests.
+        index = mock.patch.object(views, 'recipe_ingredient_index', RecipeIngredientIndex())
+        index.start()
+        self.addCleanup(index.stop)
+
+    def test_ranked_matches(self):
+        full = self.create_recipe(ingredients=2, name='Full')
+        partial = self.create_recipe(ingredients=4, name='Partial')
+        ingredients = [ingredient.pk for ingredient in self.ingredients[:2]]
+        results = self.client.get('/api/recipes/what_to_cook/', {'ingredients': ingredients}).json()['results']
+        self.assertEqual([(item['id'], item['missing']) for item in results], [(full.pk, 0), (partial.pk, 2)])
+        results = self.client.get(
+            '/api/recipes/what_to_cook/', {'ingredients': ingredients, 'max_missing': 1}
+        ).json()['results']
+        self.assertEqual([item['id'] for item in results], [full.pk])
+
+    def test_favorite_changes_etag(self):
+        recipe = self.create_recipe()
+        params = {'ingredients': self.ingredients[0].pk}
+        response = self.client.get('/api/recipes/what_to_cook/', params)
+        self.assertFalse(response.json()['results'][0]['is_favorited'])
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.reader, recipe=recipe)
+        response = self.client.get('/api/recipes/what_to_cook/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['is_favorited'])
+
+
+class ShoppingListTest(APITestMixin, TestCase):
+    """Stored shopping list lines stay equal to the sums over the users' carts."""
+
+    def setUp(self):
+        super().setUp()
+        self.users = [self.reader] + [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='password')
+            for i in range(3)
+        ]
+
+    def assertListsMatchCarts(self):
+        def lines(items):
+            return sorted((item.user_id, item.ingredient_id, item.total, item.recipes) for item in items)
+
+        user_ids = [user.pk for user in self.users]
+        self.assertEqual(
+            lines(ShoppingListItem.objects.filter(user__in=user_ids)),
+            lines(aggregate_items(user_ids)),
+        )
+
+    def add_to_carts(self, recipe, users):
+        for user in users:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client_for(user).get(f'/api/recipes/{recipe.pk}/shopping_cart/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_cart_changes(self):
+        first, second = self.create_recipe(ingredients=3), self.create_recipe(ingredients=5)
+        self.add_to_carts(first, self.users)
+        self.add_to_carts(second, self.users[:2])
+        self.assertListsMatchCarts()
+        self.assertEqual(ShoppingListItem.objects.get(user=self.reader, ingredient=self.ingredients[0]).total, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/recipes/{first.pk}/shopping_cart/')
+        self.assertListsMatchCarts()
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertListsMatchCarts()
+        self.assertFalse(ShoppingListItem.objects.filter(user=self.reader).exists())
+
+    def test_recipe_update(self):
+        recipe = self.create_recipe(ingredients=4)
+        self.add_to_carts(recipe, self.users)
+        payload = {
+            'name': 'Recipe', 'text': 'Text', 'cooking_time': 10, 'image': IMAGE,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [{'id': ingredient.pk, 'amount': 9} for ingredient in self.ingredients[2:8]],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.author).put(f'/api/recipes/{recipe.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertListsMatchCarts()
+        self.assertEqual(
+            sorted(ShoppingListItem.objects.filter(user=self.reader).values_list('ingredient', 'total')),
+            [(ingredient.pk, 9) for ingredient in self.ingredients[2:8]],
+        )
+
+    def test_amount_changes_refresh_once_per_recipe(self):
+        recipe = self.create_recipe(ingredients=10)
+        self.add_to_carts(recipe, self.users)
+        for count in (1, 5, 10):
+            amounts = list(IngredientAmount.objects.filter(recipe=recipe).order_by('ingredient')[:count])
+            # Three writes per amount, then one refresh of the lists at commit.
+            with self.subTest(count=count), self.assertNumQueries(3 * count + 7):
+                with self.captureOnCommitCallbacks(execute=True):
+                    for amount in amounts:
+                        amount.amount += 1
+                        amount.save()
+                        amount.delete()
+                        amount.pk = None
+                        amount.save()
+            self.assertListsMatchCarts()
+
+    def test_rolled_back_changes_do_not_drop_later_ones(self):
+        recipe = self.create_recipe(ingredients=2)
+        self.add_to_carts(recipe, self.users)
+        first, second = IngredientAmount.objects.filter(recipe=recipe).order_by('ingredient')
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                first.amount += 5
+                first.save()
+                IngredientAmount.objects.create(recipe=recipe, ingredient=second.ingredient, amount=1)
+            second.amount += 1
+            second.save()
+        self.assertListsMatchCarts()
+        self.assertEqual(ShoppingListItem.objects.get(user=self.reader, ingredient=second.ingredient).total, 3)
+
+
+class TokenCacheTest(APITestMixin, TestCase):
+    """Cached tokens skip the database and stop working once revoked."""
+
+    def test_cached_token_skips_queries(self):
+        self.client.get('/api/users/me/')
+        # Only the view's own lookup of whom the user follows.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.json()['id'], self.reader.pk)
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get('/api/users/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/auth/token/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_user_changes_revoke_cached_token(self):
+        self.client.get('/api/users/me/')
+        self.reader.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_last_login_does_not_revoke(self):
+        self.client.get('/api/users/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.save(update_fields=['last_login'])
+        with self.assertNumQueries(1):
+            self.client.get('/api/users/me/')
+
+    def test_lookup_started_before_revocation_is_not_cached(self):
+        key = Token.objects.get(user=self.reader).key
+        cache = TokenCache()
+        cached, generation = cache.get(key)
+        self.assertIsNone(cached)
+        cache.revoke([key])
+        cache.set(key, self.reader, Token.objects.get(key=key), generation)
+        self.assertIsNone(cache.get(key)[0])
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_shared_revocations_reach_other_processes(self):
+        key = Token.objects.get(user=self.reader).key
+        token = Token.objects.get(key=key)
+        worker, other = TokenCache(), TokenCache()
+        for cache in (worker, other):
+            _, generation = cache.get(key)
+            cache.set(key, self.reader, token, generation)
+            self.assertIsNotNone(cache.get(key)[0])
+        other.revoke([key])
+        self.assertIsNone(worker.get(key)[0])
+
+
+LOCAL_MEMORY = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_MEMORY)
+class SharedCacheCheckTest(SimpleTestCase):
+    """Several workers need a cache they all share."""
+
+    @override_settings(WEB_CONCURRENCY=1)
+    def test_single_worker_may_use_local_memory(self):
+        self.assertEqual(check_response_cache(None), [])
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_workers_may_not_use_local_memory(self):
+        self.assertEqual([error.id for error in check_response_cache(None)], ['api.E001'])
+
+    @override_settings(WEB_CONCURRENCY=4, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    })
+    def test_workers_may_share_a_cache(self):
+        self.assertEqual(check_response_cache(None), [])
+
+    @override_settings(DATABASE_REPLICAS=['replica0'])
+    def test_replicas_need_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_replica_pins(None)], ['api.E002'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(check_replica_pins(None), [])
+
+    def test_no_replicas_need_no_shared_cache(self):
+        self.assertEqual(check_replica_pins(None), [])
+
+
+class ASGIURLConf:
+    urlpatterns = [path('api/', include(async_urlpatterns(urls.router.get_urls())))]
+
+
+@override_settings(ROOT_URLCONF=ASGIURLConf)
+class ASGITest(TransactionTestCase):
+    """Requests through the ASGI handler and the async views, as under uvicorn."""
+
+    def setUp(self):
+        caches['default'].clear()
+        token_cache.revoke_all()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.token = Token.objects.create(user=self.user)
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'ingredient {i:03}', measurement_unit='g') for i in range(250)
+        ])
+        ingredients = Ingredient.objects.order_by('pk')
+        recipe = Recipe.objects.create(author=self.user, name='Recipe', text='Text', image='', cooking_time=10)
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(recipe=recipe, ingredient=ingredient, amount=index + 1)
+            for index, ingredient in enumerate(ingredients)
+        ])
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.expected = client.get('/api/recipes/download_shopping_cart/')
+
+    def request(self, path):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Token {self.token.key}'.encode())],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(ASGIHandler())(scope, receive, send)
+        return messages
+
+    def test_shopping_list_streams(self):
+        messages = self.request('/api/recipes/download_shopping_cart/')
+        self.assertEqual(messages[0]['status'], 200)
+        bodies = [message['body'] for message in messages[1:-1]]
+        self.assertTrue(all(message['more_body'] for message in messages[1:-1]))
+        self.assertEqual(messages[-1], {'type': 'http.response.body'})
+        self.assertEqual(len(bodies), 250)
+        self.assertEqual(b''.join(bodies), b''.join(self.expected.streaming_content))
+
+    def test_other_responses_are_sent_whole(self):
+        messages = self.request('/api/recipes/')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(json.loads(messages[1]['body'])['count'], 1)
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import FollowUser, UserStats
+
+BATCH_SIZE = 1000
+
+
+def pull_authors_q(prefix=''):
+    """Authors too popular or too prolific for their recipes to be copied into timelines."""
+    max_followers = getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 10000)
+    max_recipes = getattr(settings, 'FEED_FANOUT_MAX_RECIPES', 1000)
+    return (
+        Q(**{f'{prefix}stats__followers_count__gte': max_followers})
+        | Q(**{f'{prefix}stats__recipes_count__gte': max_recipes})
+    )
+
+
+def is_pull_author(author_id):
+    return UserStats.objects.filter(pull_authors_q('user__'), user_id=author_id).exists()
+
+
+def keyset(queryset, date_field, id_field, position=None, reverse=False):
+    """(date, id) keys of the queryset after position, newest first or, with reverse, oldest first."""
+    if position is not None:
+        pub_date, pk = position
+        lookup = 'gt' if reverse else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': pub_date}) | Q(**{date_field: pub_date, f'{id_field}__{lookup}': pk})
+        )
+    ordering = (date_field, id_field) if reverse else (f'-{date_field}', f'-{id_field}')
+    return queryset.order_by(*ordering).values_list(date_field, id_field)
+
+
+def get_feed_keys(user, limit, position=None, reverse=False):
+    """(pub_date, recipe id) keys of up to limit + 1 feed recipes after position.
+
+    The user's timeline is paged by its (user, -pub_date, -recipe) index;
+    recipes of followed pull authors are read over the same range and
+    merged in, so a page costs two short index scans however long the
+    timeline is.
+    """
+    keys = list(keyset(TimelineEntry.objects.filter(user=user), 'pub_date', 'recipe_id', position, reverse)[:limit + 1])
+    pull_authors = list(
+        FollowUser.objects.filter(pull_authors_q('author__'), user=user).values_list('author', flat=True)
+    )
+    if pull_authors:
+        pulled = keyset(Recipe.objects.filter(author__in=pull_authors), 'pub_date', 'id', position, reverse)
+        keys = sorted(set(keys).union(pulled[:limit + 1]), reverse=not reverse)[:limit + 1]
+    return keys
+
+
+def write_entries(rows):
+    batch = []
+    for user_id, recipe_id, author_id, pub_date in rows:
+        batch.append(TimelineEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id, pub_date=pub_date))
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).values('author', 'pub_date').first()
+    if recipe is None or recipe['author'] is None or is_pull_author(recipe['author']):
+        return
+    followers = FollowUser.objects.filter(author=recipe['author']).values_list('user', flat=True)
+    write_entries(
+        (user_id, recipe_id, recipe['author'], recipe['pub_date']) for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    if is_pull_author(author_id):
+        return
+    recipes = Recipe.objects.filter(author=author_id).values_list('pk', 'pub_date')
+    write_entries((user_id, recipe_id, author_id, pub_date) for recipe_id, pub_date in recipes.iterator())
+
+
+def remove(user_id, author_id):
+    TimelineEntry.objects.filter(user=user_id, author=author_id).delete()
+
+
+@transaction.atomic
+def rebuild_timelines(users=None):
+    """Rewrites timelines from follows, e.g. after bulk loads or authors changing mode."""
+    entries = TimelineEntry.objects.all()
+    follows = FollowUser.objects.exclude(pull_authors_q('author__')).filter(author__recipes__isnull=False)
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    entries.delete()
+    write_entries(
+        follows.values_list('user', 'author__recipes', 'author', 'author__recipes__pub_date').iterator()
+    )
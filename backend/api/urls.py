@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from django.urls.conf import include
 from rest_framework.routers import SimpleRouter
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.async_views import async_urlpatterns
+from api.views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                       RecipeViewSet, TagViewSet)
 
 router = SimpleRouter()
 router.register("users", CustomUserViewSet)
@@ -13,7 +15,11 @@ router.register("recipes", RecipeViewSet)
 
 urlpatterns = router.urls
 
+if settings.SERVER_MODE == 'asgi':
+    urlpatterns = async_urlpatterns(urlpatterns)
+
 urlpatterns += [
+    path('metrics/', MetricsView.as_view()),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
 ]
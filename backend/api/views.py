@@ -1,31 +1,57 @@
-from django.db.models import Sum
-from django.db.models import Value as V
-from django.db.models.functions import StrIndex
-from django.db.models.functions.text import Lower
-from django.http.response import HttpResponse
+from functools import partial
+
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window, prefetch_related_objects)
+from django.db.models.functions import Coalesce, RowNumber
+from django.http.response import HttpResponse, StreamingHttpResponse
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-
+from rest_framework.views import APIView
+
+from api.authentication import token_cache
+from api.autocomplete import ingredient_index
+from api.cache import recipe_cache, table_versions
+from api.counters import change_recipe_counter, change_user_counter
+from api.matching import RankedMatches, recipe_ingredient_index
+from api.metrics import (metrics, render_prometheus, render_response_cache,
+                         render_token_cache)
+from api.pagination import CursorPaginationMixin, KeysetCursorPagination
+from api.ranking import RANKINGS, order_by_rank
+from api.replicas import ReplicaReadMixin
+from api.rows import (FastReadMixin, IngredientRows, RecipeListRows,
+                      RecipeMatchRows, RecipeRows, TagRows, UserRows)
+from api.search import (search_recipes, with_all_ingredients,
+                        without_ingredients)
+from api.timeline import get_feed_keys
 from api.permissions import IsAdminOrAuthorOrReadOnly
 from api.serializers import (CustomUserCreateSerializer, CustomUserCreatedSerializer, CustomUserSerializer, FavoriteRecipeSerializer,
                              FollowUserCreateSerializer, FollowUserSerializer,
                              IngredientSerializer,
-                             RecipeCreateUpdateSerializer, RecipeSerializer,
+                             RecipeCreateUpdateSerializer, RecipeListSerializer,
+                             RecipeMatchSerializer, RecipeSerializer,
                              RecipeShortSerializer, ShoppingRecipeSerializer,
                              TagSerializer)
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingRecipe,
-                            Tag)
+from api.shopping_list import (SHOPPING_LIST_FORMATS, get_shopping_list,
+                               iter_items)
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingRecipe, Tag)
 from users.models import FollowUser, User
 
+RECIPE_TABLES = ('recipes', 'tags', 'ingredients', 'users', 'favorites', 'shopping', 'rankings')
 
-class CustomUserViewSet(UserViewSet):
+
+class CustomUserViewSet(ReplicaReadMixin, FastReadMixin, CursorPaginationMixin, UserViewSet):
     serializer_class = CustomUserSerializer
+    row_serializer_class = UserRows
+    replica_actions = ('list', 'retrieve', 'me', 'subscriptions')
     subscriptions_serializer_class = FollowUserSerializer
     queryset = User.objects.all().order_by('id')
     lookup_field = 'id'
+    cursor_ordering = ('id', )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -44,19 +70,30 @@ class CustomUserViewSet(UserViewSet):
             return self.subscriptions_serializer_class
         return super().get_serializer_class(*args, **kwargs)
 
+    def get_row_serializer_class(self):
+        if self.action in ['list', 'retrieve']:
+            return self.row_serializer_class
+        return None
+
+    @table_versions.conditional('users', 'follows')
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
         context = {}
         if request.user.is_authenticated:
             context = {'following': request.user.follower.all().values_list('pk', flat=True)}
+        if self.use_fast_read():
+            return self.fast_retrieve(context)
+        instance = self.get_object()
         serializer = self.get_serializer(instance, context=context)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
+    @table_versions.conditional('users', 'follows')
     def list(self, request, *args, **kwargs):
         users = self.get_queryset()
         context = {}
         if request.user.is_authenticated:
             context = {'following': request.user.follower.all().values_list('pk', flat=True)}
+        if self.use_fast_read():
+            return self.fast_list(users, context)
         page = self.paginate_queryset(users)
         if page is not None:
             serializer = self.get_serializer(page, many=True, context=context)
@@ -66,20 +103,54 @@ class CustomUserViewSet(UserViewSet):
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=False)
+    @table_versions.conditional('users', 'follows', 'recipes')
     def subscriptions(self, request, *args, **kwargs):
         user = request.user
         recipes_limit = int(request.query_params.get('recipes_limit', 3))
-        context = {'recipes_limit': recipes_limit}
-        following = self.get_queryset().filter(following__in=user.follower.all())
+        following = self.get_queryset().filter(following__user=user).annotate(
+            recipes_count=Coalesce(F('stats__recipes_count'), 0)
+        )
         page = self.paginate_queryset(following)
+        authors = page if page is not None else list(following)
+        context = {
+            'recipes_limit': recipes_limit,
+            'recipes': self.get_author_recipes(authors, recipes_limit),
+            'following': [author.pk for author in authors],
+        }
+        serializer = self.get_serializer(authors, many=True, context=context)
         if page is not None:
-            serializer = self.get_serializer(page, many=True, context=context)
             return self.get_paginated_response(serializer.data)
 
-        serializer = self.get_serializer(following, many=True, context=context)
-
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
+    def get_author_recipes(self, authors, recipes_limit):
+        author_recipes = {author.pk: [] for author in authors}
+        if not author_recipes or recipes_limit < 1:
+            return author_recipes
+        ranked = Recipe.objects.filter(author__in=author_recipes).annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=[F('pub_date').desc(), F('id').desc()],
+            )
+        ).order_by().values('id', 'author', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        # Only what RecipeShortSerializer and the ordering read; search_vector alone can be large.
+        columns = ', '.join(
+            Recipe._meta.get_field(field).column
+            for field in ('id', 'author', 'name', 'image', 'processed_image', 'cooking_time', 'pub_date')
+        )
+        recipes = Recipe.objects.raw(
+            f'SELECT {columns} FROM {Recipe._meta.db_table} WHERE id IN '
+            f'(SELECT id FROM ({sql}) ranked WHERE recipe_rank <= %s)',
+            params + (recipes_limit, )
+        )
+        recipes = list(recipes)
+        prefetch_related_objects(recipes, 'processed_image')
+        for recipe in sorted(recipes, key=lambda _: (_.pub_date, _.pk), reverse=True):
+            author_recipes[recipe.author_id].append(recipe)
+        return author_recipes
+
     @action(detail=True, methods=['get', 'delete'])
     def subscribe(self, request, *args, **kwargs):
         if self.request.method == 'GET':
@@ -91,7 +162,9 @@ class CustomUserViewSet(UserViewSet):
         data = {'user': request.user.pk, 'author': author.pk}
         serializer = FollowUserCreateSerializer(data=data)
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                change_user_counter(author.pk, 'followers_count', 1)
             data = FollowUserSerializer(self.get_object()).data
             return Response(data=data, status=status.HTTP_200_OK)
         return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -102,15 +175,26 @@ class CustomUserViewSet(UserViewSet):
         follow = FollowUser.objects.filter(**data).first()
         if not follow:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        self.perform_destroy(follow)
+        with transaction.atomic():
+            self.perform_destroy(follow)
+            change_user_counter(author.pk, 'followers_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, FastReadMixin, CursorPaginationMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
+    cursor_ordering = ('-pub_date', '-id')
 
     create_update_seializer = RecipeCreateUpdateSerializer
+    list_serializer = RecipeListSerializer
+
+    row_serializer_class = RecipeRows
+    list_row_serializer = RecipeListRows
+    match_row_serializer = RecipeMatchRows
+
+    async_actions = ('list', 'retrieve', 'download_shopping_cart', 'shopping_list')
+    replica_actions = ('list', 'retrieve', 'feed', 'download_shopping_cart', 'shopping_list')
 
     shopping_recipe_serializer = ShoppingRecipeSerializer
     shopping_recipe_queryset = ShoppingRecipe.objects.all()
@@ -118,10 +202,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
     favorite_recipe_serializer = FavoriteRecipeSerializer
     favorite_recipe_queryset = FavoriteRecipe.objects.all()
 
+    relation_counters = {
+        'shopping_cart': 'shopping_count',
+        'favorite': 'favorites_count',
+    }
+
     lookup_field = 'id'
 
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve']:
+            return self.get_read_queryset()
+        return self.annotate_relations(super().get_queryset())
+
+    def get_read_queryset(self):
+        queryset = self.annotate_relations(super().get_queryset())
+        return queryset.defer('search_vector').select_related('author', 'processed_image').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_amounts',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ),
+        )
+
+    def annotate_relations(self, queryset):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                FavoriteRecipe.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingRecipe.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
     def get_permissions(self):
-        if self.action in ['create', 'shopping_cart', 'favorite', 'download_shopping_cart']:
+        if self.action in ['create', 'shopping_cart', 'favorite', 'download_shopping_cart', 'shopping_list', 'feed']:
             return [IsAuthenticated()]
         elif self.action in ['update', 'destroy']:
             return [IsAdminOrAuthorOrReadOnly()]
@@ -131,12 +251,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.request.method in ['PUT', 'POST']:
             return self.create_update_seializer
         elif self.request.method in ['GET']:
+            if self.action == 'feed':
+                return self.list_serializer
             if self.action == 'shopping_cart':
                 return self.shopping_recipe_serializer
             elif self.action == 'favorite':
                 return self.favorite_recipe_serializer
+            elif self.action == 'list':
+                return self.list_serializer
         return self.serializer_class
 
+    def get_row_serializer_class(self):
+        if self.action in ['list', 'feed']:
+            return self.list_row_serializer
+        elif self.action == 'what_to_cook':
+            return self.match_row_serializer
+        elif self.action == 'retrieve':
+            return self.row_serializer_class
+        return None
+
     def get_relation_queryset(self):
         if self.request.method in ['DELETE']:
             if self.action == 'shopping_cart':
@@ -145,6 +278,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 return self.favorite_recipe_queryset
         return super().get_queryset()
 
+    def get_ranking(self):
+        ranking = self.request.query_params.get('ordering')
+        return ranking if ranking in RANKINGS else None
+
+    def use_cursor_pagination(self):
+        return (
+            super().use_cursor_pagination()
+            and self.action != 'what_to_cook'
+            and self.get_ranking() is None
+            and not self.request.query_params.get('search')
+        )
+
     @action(detail=True, methods=['get', 'delete'])
     def shopping_cart(self, request, *args, **kwargs):
         if self.request.method == 'GET':
@@ -162,7 +307,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         data = {'user': request.user.pk, 'recipe': recipe.pk}
         serializer = self.get_serializer(data=data)
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                change_recipe_counter(recipe.pk, self.relation_counters[self.action], 1)
             data = RecipeShortSerializer(self.get_object()).data
             return Response(data=data, status=status.HTTP_200_OK)
         return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -173,40 +320,93 @@ class RecipeViewSet(viewsets.ModelViewSet):
         shopping = self.get_relation_queryset().filter(**data).first()
         if not shopping:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        self.perform_destroy(shopping)
+        with transaction.atomic():
+            self.perform_destroy(shopping)
+            change_recipe_counter(recipe.pk, self.relation_counters[self.action], -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False)
     def download_shopping_cart(self, request, *args, **kwargs):
-        ingredients = Recipe.objects.filter(
-            shopping_recipe__user=request.user
-        ).order_by('ingredients__name').values(
-            'ingredients__name', 'ingredients__measurement_unit'
-        ).annotate(total_amount=Sum('ingredient_amounts__amount'))
-
-        response = HttpResponse(
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                data={'file_format': f'Supported formats: {", ".join(SHOPPING_LIST_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content_type, render = SHOPPING_LIST_FORMATS[file_format]
+        ingredients = get_shopping_list(request.user)
+        return StreamingHttpResponse(
+            render(ingredients),
             headers={
-                'Content-Type': 'text/plain',
-                'Content-Disposition': 'attachment'
+                'Content-Type': content_type,
+                'Content-Disposition': f'attachment; filename="shopping_list.{file_format}"'
             }
         )
 
-        for item in ingredients:
-            name = item.get('ingredients__name').capitalize()
-            amount = item.get('total_amount')
-            unit = item.get('ingredients__measurement_unit')
-            line = f'{name} - {amount} {unit}'
-            response.write(line + '\n')
+    @action(detail=False)
+    def shopping_list(self, request, *args, **kwargs):
+        data = [
+            {'name': name, 'amount': amount, 'measurement_unit': unit}
+            for name, amount, unit in iter_items(get_shopping_list(request.user))
+        ]
+        return Response(data=data, status=status.HTTP_200_OK)
+
+    @action(detail=False)
+    @table_versions.conditional(*RECIPE_TABLES, 'follows')
+    def feed(self, request, *args, **kwargs):
+        paginator = KeysetCursorPagination()
+        keys = paginator.paginate_keys(partial(get_feed_keys, request.user), request)
+        recipe_ids = [recipe_id for _, recipe_id in keys]
+        recipes = self.get_read_queryset().filter(pk__in=recipe_ids)
+        if self.use_fast_read():
+            serializer = self.get_row_serializer(context={})
+            rows = {row['id']: row for row in serializer.get_rows(recipes)}
+            return paginator.get_paginated_response(serializer.serialize(
+                [rows[recipe_id] for recipe_id in recipe_ids if recipe_id in rows]
+            ))
+        recipes = recipes.in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes], many=True, context={}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    @table_versions.conditional(*RECIPE_TABLES)
+    def what_to_cook(self, request, *args, **kwargs):
+        params = request.query_params
+        ingredients = [int(_) for _ in params.getlist('ingredients') if _.isdigit()]
+        max_missing = params.get('max_missing', '')
+        max_missing = int(max_missing) if max_missing.isdigit() else None
+        matches = RankedMatches(recipe_ingredient_index.match(ingredients, max_missing))
+        page = self.paginate_queryset(matches)
+        context = {'matches': {recipe_id: (matched, total) for recipe_id, matched, total in page}}
+        if self.use_fast_read():
+            serializer = self.get_row_serializer(context=context)
+            rows = serializer.get_rows(self.get_read_queryset().filter(pk__in=list(context['matches'])))
+            rows = {row['id']: row for row in rows}
+            return self.get_paginated_response(serializer.serialize(
+                [rows[recipe_id] for recipe_id, _, _ in page if recipe_id in rows]
+            ))
+        recipes = self.get_read_queryset().in_bulk([recipe_id for recipe_id, _, _ in page])
+        serializer = RecipeMatchSerializer(
+            [recipes[recipe_id] for recipe_id, _, _ in page if recipe_id in recipes], many=True, context=context
+        )
+        return self.get_paginated_response(serializer.data)
 
-        return response
+    @table_versions.conditional(*RECIPE_TABLES)
+    @recipe_cache
+    def retrieve(self, request, *args, **kwargs):
+        if self.use_fast_read():
+            return self.fast_retrieve()
+        return super().retrieve(request, *args, **kwargs)
 
+    @table_versions.conditional(*RECIPE_TABLES)
+    @recipe_cache
     def list(self, request, *args, **kwargs):
         recipes = self.filter_queryset(self.get_queryset())
-        following, shopping = [], []
-        if request.user.is_authenticated:
-            following = list(self.request.user.follower_recipe.values_list('recipe', flat=True))
-            shopping = list(self.request.user.shopper_recipe.values_list('recipe', flat=True))
-        context = {'following': following, 'shopping': shopping}
+        context = {}
+        if self.use_fast_read():
+            return self.fast_list(recipes, context)
 
         page = self.paginate_queryset(recipes)
         if page is not None:
@@ -222,6 +422,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         tags = params.getlist('tags', None)
         is_favorited = bool(params.get('is_favorited', 0))
         is_in_shopping_cart = bool(params.get('is_in_shopping_cart', 0))
+        search = params.get('search', '').strip()
+        ingredients = [_ for _ in params.getlist('ingredients') if _.isdigit()]
+        exclude_ingredients = [_ for _ in params.getlist('exclude_ingredients') if _.isdigit()]
+        max_cooking_time = params.get('max_cooking_time', '')
 
         if author_id is not None:
             queryset = queryset.filter(author__id=author_id)
@@ -230,12 +434,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(tags__slug__in=tags).distinct()
 
         if is_favorited is True:
-            favorited = list(self.request.user.follower_recipe.values_list('recipe', flat=True))
-            queryset = queryset.filter(id__in=favorited)
+            queryset = queryset.filter(is_favorited=True)
 
         if is_in_shopping_cart is True:
-            shopping_cart = list(self.request.user.shopper_recipe.values_list('recipe', flat=True))
-            queryset = queryset.filter(id__in=shopping_cart)
+            queryset = queryset.filter(is_in_shopping_cart=True)
+
+        if ingredients:
+            queryset = with_all_ingredients(queryset, ingredients)
+
+        if exclude_ingredients:
+            queryset = without_ingredients(queryset, exclude_ingredients)
+
+        if max_cooking_time.isdigit():
+            queryset = queryset.filter(cooking_time__lte=int(max_cooking_time))
+
+        if search:
+            queryset = search_recipes(queryset, search)
+
+        ranking = self.get_ranking()
+        if ranking is not None:
+            queryset = order_by_rank(queryset, ranking)
 
         return super().filter_queryset(queryset)
 
@@ -244,45 +462,98 @@ class RecipeViewSet(viewsets.ModelViewSet):
         data.update({'author': request.user.pk})
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        instance = serializer.save(serializer.validated_data)
+        with transaction.atomic():
+            instance = serializer.save(serializer.validated_data)
+            change_user_counter(instance.author_id, 'recipes_count', 1)
 
+        instance = self.get_read_queryset().get(pk=instance.pk)
         data = self.serializer_class(instance).data
         return Response(data=data, status=status.HTTP_201_CREATED)
 
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        with transaction.atomic():
+            self.perform_destroy(instance)
+            change_user_counter(instance.author_id, 'recipes_count', -1)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def update(self, request, **kwargs):
         instance = self.get_object()
         data = request.data
         data.update({'author': instance.author.pk})
         serializer = self.get_serializer(instance=instance, data=data, partial=False)
         serializer.is_valid(raise_exception=True)
-        serializer.save(serializer.validated_data)
+        instance = serializer.save(serializer.validated_data)
 
-        data = self.serializer_class(self.get_object()).data
+        instance = self.get_read_queryset().get(pk=instance.pk)
+        data = self.serializer_class(instance).data
         return Response(data=data, status=status.HTTP_200_OK)
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, FastReadMixin, viewsets.ModelViewSet):
     serializer_class = IngredientSerializer
+    row_serializer_class = IngredientRows
+    async_actions = ('list', 'retrieve')
+    replica_actions = ('list', 'retrieve')
     queryset = Ingredient.objects.all()
     permission_classes = []
     lookup_field = 'id'
     pagination_class = None
 
-    def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        lookup = self.request.query_params.get('name')
-        if lookup is not None:
-            queryset = queryset.filter(name__icontains=lookup)
-            queryset = queryset.annotate(name_lookup=Lower('name'))
-            queryset = queryset.annotate(name_pos=StrIndex('name_lookup', V(lookup)))
-            queryset = queryset.order_by('name_pos')
-        return queryset
+    @table_versions.conditional('ingredients')
+    def retrieve(self, request, *args, **kwargs):
+        if self.use_fast_read():
+            return self.fast_retrieve()
+        return super().retrieve(request, *args, **kwargs)
 
+    @table_versions.conditional('ingredients')
+    def list(self, request, *args, **kwargs):
+        lookup = request.query_params.get('name')
+        if lookup is None:
+            if self.use_fast_read():
+                return self.fast_list(self.filter_queryset(self.get_queryset()))
+            return super().list(request, *args, **kwargs)
+        ingredients = ingredient_index.search(lookup)
+        if self.use_fast_read():
+            serializer = self.get_row_serializer()
+            return Response(
+                data=serializer.serialize(serializer.instance_rows(ingredients)), status=status.HTTP_200_OK
+            )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
 
-class TagViewSet(viewsets.ModelViewSet):
+
+class TagViewSet(ReplicaReadMixin, FastReadMixin, viewsets.ModelViewSet):
     serializer_class = TagSerializer
+    row_serializer_class = TagRows
+    async_actions = ('list', 'retrieve')
+    replica_actions = ('list', 'retrieve')
     queryset = Tag.objects.all()
     permission_classes = []
     lookup_field = 'slug'
     pagination_class = None
     permission_classes = [AllowAny, ]
+
+    @table_versions.conditional('tags')
+    def retrieve(self, request, *args, **kwargs):
+        if self.use_fast_read():
+            return self.fast_retrieve()
+        return super().retrieve(request, *args, **kwargs)
+
+    @table_versions.conditional('tags')
+    def list(self, request, *args, **kwargs):
+        if self.use_fast_read():
+            return self.fast_list(self.filter_queryset(self.get_queryset()))
+        return super().list(request, *args, **kwargs)
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            render_prometheus(metrics.collect())
+            + render_token_cache(token_cache.stats())
+            + render_response_cache(recipe_cache.stats()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
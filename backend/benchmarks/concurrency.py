@@ -0,0 +1,147 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+from benchmarks.runner import quantile
+
+UVICORN = ['-k', 'uvicorn.workers.UvicornWorker']
+
+SERVERS = {
+    'wsgi': ('foodgram.wsgi:application', [], 'wsgi'),
+    'asgi': ('foodgram.asgi:application', UVICORN, 'asgi'),
+    'asgi_sync': ('foodgram.asgi:application', UVICORN, 'wsgi'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """A gunicorn process serving the project from the current settings database."""
+
+    def __init__(self, mode, workers):
+        self.mode = mode
+        self.workers = workers
+        self.port = free_port()
+        self.process = None
+
+    def __enter__(self):
+        application, options, server_mode = SERVERS[self.mode]
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', application, *options,
+                '--bind', f'127.0.0.1:{self.port}', '--workers', str(self.workers),
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'SERVER_MODE': server_mode},
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.mode} server exited with code {self.process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError(f'{self.mode} server did not start')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+async def fetch(port, path, timeout, byte_delay=0.0):
+    """Sends a GET, byte by byte with byte_delay between bytes, and returns its status code."""
+    request = f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        if byte_delay:
+            for index in range(len(request)):
+                writer.write(request[index:index + 1])
+                await writer.drain()
+                await asyncio.sleep(byte_delay)
+        else:
+            writer.write(request)
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response else 0
+
+
+class Load:
+    def __init__(self, port, paths, duration, timeout):
+        self.port = port
+        self.paths = paths
+        self.deadline = time.monotonic() + duration
+        self.timeout = timeout
+        self.durations = []
+        self.errors = 0
+        self.slow_completed = 0
+
+    async def fast_client(self, offset):
+        index = offset
+        while time.monotonic() < self.deadline:
+            path = self.paths[index % len(self.paths)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                status = await fetch(self.port, path, self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                status = 0
+            if status == 200:
+                self.durations.append(time.perf_counter() - start)
+            else:
+                self.errors += 1
+
+    async def slow_client(self, byte_delay):
+        while time.monotonic() < self.deadline:
+            try:
+                await fetch(self.port, self.paths[0], self.timeout, byte_delay)
+            except (OSError, asyncio.TimeoutError):
+                continue
+            self.slow_completed += 1
+
+    async def run(self, clients, slow_clients, slow_duration):
+        byte_delay = slow_duration / len(f'GET {self.paths[0]} HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await asyncio.gather(
+            *(self.fast_client(offset) for offset in range(clients)),
+            *(self.slow_client(byte_delay) for _ in range(slow_clients)),
+        )
+
+
+def measure(mode, paths, workers=2, clients=16, slow_clients=8, slow_duration=5.0, duration=10.0, timeout=10.0):
+    """Runs fast clients cycling through paths next to slow clients trickling their requests."""
+    with Server(mode, workers) as server:
+        # Warm up per-process caches and indexes before measuring.
+        for path in paths * workers:
+            asyncio.run(fetch(server.port, path, timeout * 3))
+        load = Load(server.port, paths, duration, timeout)
+        start = time.perf_counter()
+        asyncio.run(load.run(clients, slow_clients, slow_duration))
+        elapsed = time.perf_counter() - start
+    durations = load.durations or [0.0]
+    return {
+        'mode': mode,
+        'requests': len(load.durations),
+        'throughput': len(load.durations) / elapsed,
+        'p50': quantile(durations, 0.5) * 1000,
+        'p95': quantile(durations, 0.95) * 1000,
+        'p99': quantile(durations, 0.99) * 1000,
+        'errors': load.errors,
+        'slow': load.slow_completed,
+    }
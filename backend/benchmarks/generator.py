@@ -0,0 +1,196 @@
+import csv
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.counters import reconcile_recipes, reconcile_users
+from api.ranking import update_rankings
+from api.search import rebuild_search_index
+from api.shopping_list import rebuild_shopping_lists
+from api.timeline import rebuild_timelines
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingRecipe, Tag)
+from users.models import FollowUser
+
+User = get_user_model()
+
+CATALOG = Path(settings.BASE_DIR).parent / 'data' / 'ingredients.csv'
+PASSWORD = 'bench-password'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F4C430', 'dessert'),
+    ('Выпечка', '#C1A75A', 'baking'),
+)
+WORDS = (
+    'быстрый', 'домашний', 'острый', 'сладкий', 'летний', 'овощной', 'сытный',
+    'пирог', 'салат', 'суп', 'рагу', 'омлет', 'паста', 'запеканка', 'соус',
+)
+
+
+@contextmanager
+def explicit_pub_date():
+    field = Recipe._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def random_pairs(rng, left, right, count, exclude_equal=False):
+    seen = set()
+    attempts = count * 3
+    while len(seen) < count and attempts:
+        attempts -= 1
+        pair = (rng.choice(left), rng.choice(right))
+        if exclude_equal and pair[0] == pair[1]:
+            continue
+        seen.add(pair)
+    return seen
+
+
+class DataGenerator:
+    """Fills the database with a synthetic but realistically shaped dataset.
+
+    Objects are written with bulk_create in batches with explicit ids, so
+    memory stays bounded and SQLite and Postgres behave the same.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+
+    def load_catalog(self, path=CATALOG):
+        if Ingredient.objects.exists():
+            return
+        with open(path, encoding='utf-8') as catalog:
+            ingredients = [
+                Ingredient(name=row[0], measurement_unit=row[1])
+                for row in csv.reader(catalog) if len(row) == 2
+            ]
+        Ingredient.objects.bulk_create(ingredients, batch_size=self.batch_size)
+        self.log(f'ingredients: {len(ingredients)}')
+
+    def create_tags(self):
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name, 'color': color})
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        start = next_id(User)
+        users = (
+            User(
+                id=start + i,
+                username=f'bench{start + i}',
+                email=f'bench{start + i}@example.org',
+                first_name='Bench',
+                last_name=f'User{start + i}',
+                password=password,
+            )
+            for i in range(count)
+        )
+        for chunk in chunks(users, self.batch_size):
+            User.objects.bulk_create(chunk)
+        self.log(f'users: {count}')
+        return list(range(start, start + count))
+
+    def create_recipes(self, count, authors, tags, ingredients, ingredients_per_recipe):
+        start = next_id(Recipe)
+        now = timezone.now()
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            recipes, recipe_tags, amounts = [], [], []
+            for i in range(offset, offset + size):
+                recipe_id = start + i
+                recipes.append(Recipe(
+                    id=recipe_id,
+                    author_id=self.rng.choice(authors),
+                    name=f'{self.rng.choice(WORDS)} {self.rng.choice(WORDS)} {recipe_id}',
+                    image='recipes/bench.png',
+                    text=' '.join(self.rng.choices(WORDS, k=30)),
+                    cooking_time=self.rng.randint(5, 180),
+                    pub_date=now - timedelta(minutes=count - i),
+                ))
+                for tag_id in self.rng.sample(tags, self.rng.randint(1, min(3, len(tags)))):
+                    recipe_tags.append(Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id))
+                size_range = (max(1, ingredients_per_recipe // 2), ingredients_per_recipe * 3 // 2)
+                for ingredient_id in self.rng.sample(ingredients, self.rng.randint(*size_range)):
+                    amounts.append(IngredientAmount(
+                        recipe_id=recipe_id, ingredient_id=ingredient_id, amount=self.rng.randint(1, 500)
+                    ))
+            with explicit_pub_date():
+                Recipe.objects.bulk_create(recipes)
+            Recipe.tags.through.objects.bulk_create(recipe_tags)
+            IngredientAmount.objects.bulk_create(amounts, batch_size=self.batch_size)
+            self.log(f'recipes: {offset + size}/{count}')
+        return list(range(start, start + count))
+
+    def create_relations(self, model, left_field, right_field, pairs):
+        for chunk in chunks(pairs, self.batch_size):
+            model.objects.bulk_create(
+                [model(**{left_field: left, right_field: right}) for left, right in chunk],
+                ignore_conflicts=True,
+            )
+        self.log(f'{model._meta.model_name}: {len(pairs)}')
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(no_style(), [User, Recipe])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def generate(self, users, recipes, favorites, carts, follows, ingredients_per_recipe=8, cart_size=0):
+        with transaction.atomic():
+            self.load_catalog()
+            tags = self.create_tags()
+            ingredients = list(Ingredient.objects.values_list('id', flat=True))
+            user_ids = self.create_users(users)
+            recipe_ids = self.create_recipes(recipes, user_ids, tags, ingredients, ingredients_per_recipe)
+            self.create_relations(
+                FavoriteRecipe, 'user_id', 'recipe_id',
+                random_pairs(self.rng, user_ids, recipe_ids, favorites)
+            )
+            cart_pairs = random_pairs(self.rng, user_ids, recipe_ids, carts)
+            if cart_size:
+                cart_pairs |= {(user_ids[0], recipe_id) for recipe_id in recipe_ids[:cart_size]}
+            self.create_relations(ShoppingRecipe, 'user_id', 'recipe_id', cart_pairs)
+            self.create_relations(
+                FollowUser, 'user_id', 'author_id',
+                random_pairs(self.rng, user_ids, user_ids, follows, exclude_equal=True)
+            )
+            self.reset_sequences()
+            reconcile_recipes()
+            reconcile_users()
+            update_rankings()
+            rebuild_timelines()
+            rebuild_search_index()
+            rebuild_shopping_lists()
+        return user_ids, recipe_ids
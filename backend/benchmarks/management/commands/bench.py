@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import run
+from benchmarks.scenarios import SCENARIOS, WRITE_SCENARIOS, Context
+
+
+class Command(BaseCommand):
+    help = 'Run API benchmark scenarios and report latency, queries per request and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*',
+            help=f'Scenarios to run (default: all read scenarios): {", ".join(SCENARIOS)}'
+        )
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--cold', action='store_true', help='Invalidate the anonymous response cache before every request'
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or [name for name in SCENARIOS if name not in WRITE_SCENARIOS]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        context = Context(seed=options['seed'])
+        self.stdout.write(
+            f'{"scenario":20} {"ops":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"mean ms":>8} {"q/op":>6} {"ops/s":>8} {"errors":>6}'
+        )
+        for name in names:
+            row = run(
+                name, SCENARIOS[name], context,
+                iterations=options['iterations'], warmup=options['warmup'], cold=options['cold']
+            ).row()
+            self.stdout.write(
+                f'{row["scenario"]:20} {row["ops"]:>6} {row["p50"]:>8.2f} {row["p95"]:>8.2f} '
+                f'{row["p99"]:>8.2f} {row["mean"]:>8.2f} {row["queries"]:>6.1f} '
+                f'{row["throughput"]:>8.1f} {row["errors"]:>6}'
+            )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from api.autocomplete import ingredient_index
+from api.cache import recipe_cache, table_versions
+from benchmarks.generator import CATALOG, DataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, recipes, favorites, carts and follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--recipes', type=int, default=200000)
+        parser.add_argument('--favorites', type=int, default=500000)
+        parser.add_argument('--carts', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--cart-size', type=int, default=150,
+            help="Put this many recipes into the first generated user's cart"
+        )
+        parser.add_argument('--catalog', default=str(CATALOG), help='Ingredient catalog CSV (name,unit)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = DataGenerator(
+            seed=options['seed'], batch_size=options['batch_size'], log=self.stdout.write
+        )
+        generator.load_catalog(options['catalog'])
+        generator.generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            follows=options['follows'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            cart_size=options['cart_size'],
+        )
+        ingredient_index.invalidate()
+        recipe_cache.invalidate()
+        for table in ('ingredients', 'recipes', 'tags', 'users', 'favorites', 'shopping', 'follows'):
+            table_versions.bump(table)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.plans import QUERIES, explain, measure
+
+
+class Command(BaseCommand):
+    help = 'Print query plans and median timings of hot lookup queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help=f'Queries to explain (default: all): {", ".join(QUERIES)}')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        names = options['queries'] or list(QUERIES)
+        unknown = set(names) - set(QUERIES)
+        if unknown:
+            raise CommandError(f'Unknown queries: {", ".join(sorted(unknown))}')
+
+        for name in names:
+            queryset = QUERIES[name]()
+            self.stdout.write(f'{name}: {measure(queryset, options["iterations"]):.2f} ms')
+            for line in explain(queryset):
+                self.stdout.write(f'    {line}')
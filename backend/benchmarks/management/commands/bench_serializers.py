@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.serialization import CASES, compare
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF serializers and JSONRenderer with row serializers and FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cases', nargs='*', help=f'Cases to run (default: all): {", ".join(CASES)}')
+        parser.add_argument('--size', type=int, default=100, help='Objects per serialized page')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        names = options['cases'] or list(CASES)
+        unknown = set(names) - set(CASES)
+        if unknown:
+            raise CommandError(f'Unknown cases: {", ".join(sorted(unknown))}')
+
+        self.stdout.write(
+            f'{"case":12} {"items":>6} {"serializer":>11} {"rows":>8} {"render":>8} {"fast":>8} {"identical":>10}'
+        )
+        for name in names:
+            row = compare(name, options['size'], options['iterations'])
+            self.stdout.write(
+                f'{row["case"]:12} {row["items"]:>6} {row["serializer"]:>11.2f} {row["rows"]:>8.2f} '
+                f'{row["render"]:>8.2f} {row["fast_render"]:>8.2f} {"yes" if row["identical"] else "NO":>10}'
+            )
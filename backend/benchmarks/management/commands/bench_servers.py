@@ -0,0 +1,57 @@
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.concurrency import SERVERS, measure
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Compare gunicorn sync workers with uvicorn workers under fast and slow (trickling) clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modes', nargs='*', help=f'Server modes (default: wsgi asgi): {", ".join(SERVERS)}'
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent fast clients')
+        parser.add_argument('--slow-clients', type=int, default=8, help='Concurrent clients trickling requests')
+        parser.add_argument(
+            '--slow-duration', type=float, default=5.0, help='Seconds a slow client takes to send a request'
+        )
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per mode')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Seconds before a request is an error')
+
+    def get_paths(self):
+        recipe = Recipe.objects.order_by('-pub_date', '-id').values_list('id', flat=True).first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        if recipe is None or ingredient is None:
+            raise CommandError('No recipes or ingredients, run bench_data first')
+        return [
+            '/api/recipes/?limit=6',
+            f'/api/recipes/{recipe}/',
+            f'/api/ingredients/?name={quote(ingredient[:2])}',
+            '/api/tags/',
+        ]
+
+    def handle(self, *args, **options):
+        modes = options['modes'] or ['wsgi', 'asgi']
+        unknown = set(modes) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+
+        paths = self.get_paths()
+        self.stdout.write(
+            f'{"mode":10} {"requests":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"errors":>6} {"slow":>6}'
+        )
+        for mode in modes:
+            row = measure(
+                mode, paths, workers=options['workers'], clients=options['clients'],
+                slow_clients=options['slow_clients'], slow_duration=options['slow_duration'],
+                duration=options['duration'], timeout=options['timeout'],
+            )
+            self.stdout.write(
+                f'{row["mode"]:10} {row["requests"]:>8} {row["throughput"]:>8.1f} {row["p50"]:>8.2f} '
+                f'{row["p95"]:>8.2f} {row["p99"]:>8.2f} {row["errors"]:>6} {row["slow"]:>6}'
+            )
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.db import connection
+
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+
+
+def recipe_page():
+    return Recipe.objects.order_by('-pub_date', '-id')[600:606]
+
+
+def recipe_cursor_page():
+    recipe = Recipe.objects.order_by('-pub_date', '-id').values('pub_date')[600]
+    return Recipe.objects.filter(pub_date__lt=recipe['pub_date']).order_by('-pub_date', '-id')[:6]
+
+
+def recipe_tags_page():
+    slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+    return Recipe.objects.filter(tags__slug__in=slugs).distinct().order_by('-pub_date', '-id')[:6]
+
+
+def tag_lookup():
+    slug = Tag.objects.values_list('slug', flat=True).last()
+    return Tag.objects.filter(slug=slug)
+
+
+def ingredient_search():
+    return Ingredient.objects.filter(name__icontains='мол')
+
+
+def ingredient_prefix():
+    return Ingredient.objects.filter(name__startswith='мол').order_by('name')
+
+
+def recipe_ingredient():
+    amount = IngredientAmount.objects.values('recipe', 'ingredient').last()
+    return IngredientAmount.objects.filter(**amount)
+
+
+QUERIES = {
+    'recipe_page': recipe_page,
+    'recipe_cursor_page': recipe_cursor_page,
+    'recipe_tags_page': recipe_tags_page,
+    'tag_lookup': tag_lookup,
+    'ingredient_search': ingredient_search,
+    'ingredient_prefix': ingredient_prefix,
+    'recipe_ingredient': recipe_ingredient,
+}
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def measure(queryset, iterations):
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        list(queryset.all())
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api.cache import recipe_cache
+
+
+def quantile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Result:
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+        self.queries = []
+        self.errors = 0
+
+    def row(self):
+        total = sum(self.durations)
+        return {
+            'scenario': self.name,
+            'ops': len(self.durations),
+            'p50': quantile(self.durations, 0.5) * 1000,
+            'p95': quantile(self.durations, 0.95) * 1000,
+            'p99': quantile(self.durations, 0.99) * 1000,
+            'mean': statistics.mean(self.durations) * 1000,
+            'queries': statistics.mean(self.queries),
+            'throughput': len(self.durations) / total if total else 0.0,
+            'errors': self.errors,
+        }
+
+
+def run(name, scenario, context, iterations, warmup=0, cold=False):
+    client = Client(SERVER_NAME='localhost')
+    for _ in range(warmup):
+        scenario(client, context)
+    result = Result(name)
+    for _ in range(iterations):
+        if cold:
+            recipe_cache.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = scenario(client, context)
+            result.durations.append(time.perf_counter() - start)
+        result.queries.append(len(queries))
+        if response is not None and response.status_code >= 400:
+            result.errors += 1
+    return result
@@ -0,0 +1,220 @@
+import random
+
+from django.db.models import Count
+from django.db.models import Value as V
+from django.db.models.functions import Lower, StrIndex
+from rest_framework.authtoken.models import Token
+
+from api.autocomplete import ingredient_index
+from benchmarks.generator import WORDS
+from recipes.models import Ingredient, Recipe, ShoppingRecipe, Tag
+from users.models import FollowUser
+
+IMAGE = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+)
+
+
+class Context:
+    """Ids sampled from the database once, shared by all scenarios."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        self.names = list(Ingredient.objects.values_list('name', flat=True))
+        self.recipe_count = Recipe.objects.count()
+        self.recipes = list(Recipe.objects.values_list('id', flat=True)[:1000])
+        self.followers = list(
+            FollowUser.objects.values('user').annotate(total=Count('id'))
+            .order_by('-total').values_list('user', flat=True)[:50]
+        )
+        self.shoppers = list(
+            ShoppingRecipe.objects.values('user').annotate(total=Count('id'))
+            .order_by('-total').values_list('user', flat=True)[:50]
+        )
+        self.authors = list(
+            Recipe.objects.exclude(author=None).values_list('author', flat=True)[:50]
+        )
+        self.tokens = {}
+        self.own_recipes = {}
+
+    def token(self, user_id):
+        if user_id not in self.tokens:
+            self.tokens[user_id] = Token.objects.get_or_create(user_id=user_id)[0].key
+        return self.tokens[user_id]
+
+    def auth(self, user_id):
+        return {'HTTP_AUTHORIZATION': f'Token {self.token(user_id)}'}
+
+    def recipe_payload(self):
+        return {
+            'name': 'benchmark recipe',
+            'text': 'benchmark',
+            'cooking_time': self.rng.randint(5, 120),
+            'image': IMAGE,
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': self.rng.randint(1, 500)}
+                for ingredient_id in self.rng.sample(self.ingredients, 20)
+            ],
+        }
+
+
+def feed(client, context):
+    page = context.rng.randint(1, 10)
+    return client.get('/api/recipes/', {'page': page, 'limit': 6})
+
+
+def feed_tags(client, context):
+    tags = context.rng.sample(context.tags, min(2, len(context.tags)))
+    return client.get('/api/recipes/', {'tags': tags, 'page': 1, 'limit': 6})
+
+
+def feed_deep_page(client, context):
+    page = max(1, context.recipe_count // 6 - context.rng.randint(0, 10))
+    return client.get('/api/recipes/', {'page': page, 'limit': 6})
+
+
+def feed_popular(client, context):
+    page = context.rng.randint(1, 10)
+    return client.get('/api/recipes/', {'ordering': 'popular', 'page': page, 'limit': 6})
+
+
+def feed_trending(client, context):
+    page = context.rng.randint(1, 10)
+    return client.get('/api/recipes/', {'ordering': 'trending', 'page': page, 'limit': 6})
+
+
+def feed_cursor(client, context):
+    data = client.get('/api/recipes/', {'cursor': '', 'limit': 6}).json()
+    for _ in range(context.rng.randint(1, 20)):
+        if not data['next']:
+            break
+        data = client.get(data['next']).json()
+
+
+def feed_authenticated(client, context):
+    user_id = context.rng.choice(context.followers or context.authors)
+    return client.get('/api/recipes/', {'page': 1, 'limit': 6}, **context.auth(user_id))
+
+
+def following_feed(client, context):
+    user_id = context.rng.choice(context.followers)
+    data = client.get('/api/recipes/feed/', {'cursor': '', 'limit': 6}, **context.auth(user_id)).json()
+    for _ in range(context.rng.randint(0, 5)):
+        if not data['next']:
+            break
+        data = client.get(data['next'], **context.auth(user_id)).json()
+
+
+def recipe_detail(client, context):
+    recipe_id = context.rng.choice(context.recipes)
+    return client.get(f'/api/recipes/{recipe_id}/')
+
+
+def search(client, context):
+    words = ' '.join(context.rng.sample(WORDS, context.rng.randint(1, 2)))
+    return client.get('/api/recipes/', {'search': words, 'page': 1, 'limit': 6})
+
+
+def search_filters(client, context):
+    return client.get('/api/recipes/', {
+        'search': context.rng.choice(WORDS),
+        'ingredients': context.rng.sample(context.ingredients, 1),
+        'exclude_ingredients': context.rng.sample(context.ingredients, 3),
+        'max_cooking_time': context.rng.randint(20, 120),
+        'page': 1,
+        'limit': 6,
+    })
+
+
+def what_to_cook(client, context):
+    ingredients = context.rng.sample(context.ingredients, context.rng.randint(5, 30))
+    return client.get('/api/recipes/what_to_cook/', {'ingredients': ingredients, 'page': 1, 'limit': 6})
+
+
+def autocomplete(client, context):
+    name = context.rng.choice(context.names)
+    return client.get('/api/ingredients/', {'name': name[:context.rng.randint(1, 4)]})
+
+
+def autocomplete_index(client, context):
+    name = context.rng.choice(context.names)[:context.rng.randint(1, 4)]
+    ingredient_index.search(name)
+
+
+def autocomplete_db(client, context):
+    name = context.rng.choice(context.names)[:context.rng.randint(1, 4)]
+    list(
+        Ingredient.objects.filter(name__icontains=name)
+        .annotate(name_lookup=Lower('name'))
+        .annotate(name_pos=StrIndex('name_lookup', V(name)))
+        .order_by('name_pos')
+    )
+
+
+def subscriptions(client, context):
+    user_id = context.rng.choice(context.followers)
+    return client.get('/api/users/subscriptions/', {'recipes_limit': 3}, **context.auth(user_id))
+
+
+def recipe_create(client, context):
+    user_id = context.rng.choice(context.authors)
+    response = client.post(
+        '/api/recipes/', context.recipe_payload(), content_type='application/json', **context.auth(user_id)
+    )
+    if response.status_code == 201:
+        context.own_recipes.setdefault(user_id, []).append(response.json()['id'])
+    return response
+
+
+def recipe_update(client, context):
+    if not context.own_recipes:
+        recipe_create(client, context)
+    user_id = context.rng.choice(list(context.own_recipes))
+    recipe_id = context.rng.choice(context.own_recipes[user_id])
+    return client.put(
+        f'/api/recipes/{recipe_id}/', context.recipe_payload(),
+        content_type='application/json', **context.auth(user_id)
+    )
+
+
+def shopping_list(client, context):
+    user_id = context.rng.choice(context.shoppers)
+    response = client.get('/api/recipes/download_shopping_cart/', **context.auth(user_id))
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def shopping_list_json(client, context):
+    user_id = context.rng.choice(context.shoppers)
+    return client.get('/api/recipes/shopping_list/', **context.auth(user_id))
+
+
+SCENARIOS = {
+    'feed': feed,
+    'feed_tags': feed_tags,
+    'feed_deep_page': feed_deep_page,
+    'feed_popular': feed_popular,
+    'feed_trending': feed_trending,
+    'feed_cursor': feed_cursor,
+    'feed_authenticated': feed_authenticated,
+    'following_feed': following_feed,
+    'recipe_detail': recipe_detail,
+    'search': search,
+    'search_filters': search_filters,
+    'what_to_cook': what_to_cook,
+    'autocomplete': autocomplete,
+    'autocomplete_index': autocomplete_index,
+    'autocomplete_db': autocomplete_db,
+    'subscriptions': subscriptions,
+    'recipe_create': recipe_create,
+    'recipe_update': recipe_update,
+    'shopping_list': shopping_list,
+    'shopping_list_json': shopping_list_json,
+}
+
+WRITE_SCENARIOS = ('recipe_create', 'recipe_update')
@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.db.models import BooleanField, Prefetch, Value
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+from api.rows import IngredientRows, RecipeListRows, TagRows, UserRows
+from api.serializers import (CustomUserSerializer, IngredientSerializer,
+                             RecipeListSerializer, TagSerializer)
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+
+
+def recipes():
+    return Recipe.objects.annotate(
+        is_favorited=Value(False, output_field=BooleanField()),
+        is_in_shopping_cart=Value(False, output_field=BooleanField()),
+    ).order_by('-pub_date', '-id')
+
+
+def serializer_recipes(size):
+    queryset = recipes().select_related('author', 'processed_image').prefetch_related(
+        'tags', Prefetch('ingredient_amounts', queryset=IngredientAmount.objects.select_related('ingredient'))
+    )
+    return RecipeListSerializer(queryset[:size], many=True).data
+
+
+def row_recipes(size):
+    serializer = RecipeListRows()
+    return serializer.serialize(serializer.get_rows(recipes())[:size])
+
+
+def serializer_users(size):
+    return CustomUserSerializer(User.objects.order_by('id')[:size], many=True).data
+
+
+def row_users(size):
+    serializer = UserRows()
+    return serializer.serialize(serializer.get_rows(User.objects.order_by('id'))[:size])
+
+
+def serializer_tags(size):
+    return TagSerializer(Tag.objects.all()[:size], many=True).data
+
+
+def row_tags(size):
+    serializer = TagRows()
+    return serializer.serialize(serializer.get_rows(Tag.objects.all())[:size])
+
+
+def serializer_ingredients(size):
+    return IngredientSerializer(Ingredient.objects.all()[:size], many=True).data
+
+
+def row_ingredients(size):
+    serializer = IngredientRows()
+    return serializer.serialize(serializer.get_rows(Ingredient.objects.all())[:size])
+
+
+CASES = {
+    'recipes': (serializer_recipes, row_recipes),
+    'users': (serializer_users, row_users),
+    'tags': (serializer_tags, row_tags),
+    'ingredients': (serializer_ingredients, row_ingredients),
+}
+
+
+def measure(function, iterations):
+    durations = []
+    result = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000, result
+
+
+def compare(name, size, iterations):
+    """Times serializer against rows and JSONRenderer against FastJSONRenderer on the same data."""
+    serializer, rows = CASES[name]
+    serialize_ms, data = measure(lambda: serializer(size), iterations)
+    rows_ms, row_data = measure(lambda: rows(size), iterations)
+    render_ms, content = measure(lambda: JSONRenderer().render(data), iterations)
+    fast_render_ms, fast_content = measure(lambda: FastJSONRenderer().render(row_data), iterations)
+    return {
+        'case': name,
+        'items': len(data),
+        'serializer': serialize_ms,
+        'rows': rows_ms,
+        'render': render_ms,
+        'fast_render': fast_render_ms,
+        'identical': content == fast_content,
+    }
@@ -1,8 +1,13 @@
 #!/bin/sh
 
 sleep 2
+python manage.py check || exit 1
 python manage.py migrate
 python manage.py collectstatic --no-input
-gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
+if [ "$SERVER_MODE" = "asgi" ]; then
+    gunicorn foodgram.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
+else
+    gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
+fi
 
 exec "$@"
\ No newline at end of file
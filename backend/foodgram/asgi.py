@@ -1,7 +1,16 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from foodgram.db.warmup import warm_up
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from api.async_views import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
+
+# Requests run on executor threads, so only pooled connections would be reused.
+warm_up(persistent=False)
@@ -0,0 +1,82 @@
+import os
+import threading
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections shared by the threads of a process.
+
+    At most size connections are checked out at once; checkouts beyond that
+    wait up to timeout seconds for a release. Idle connections are reused
+    most recently released first, so surplus ones can time out server-side.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def acquire(self, connect, check=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(f'No free connection in the pool of {self.size} after {self.timeout}s')
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return connect()
+                if check is None or check(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        try:
+            self.put(connection)
+        finally:
+            self._slots.release()
+
+    def put(self, connection):
+        if not connection.closed:
+            status = connection.get_transaction_status()
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+            elif status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        if connection.closed:
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def fill(self, connect, count):
+        """Opens connections up to count idle ones, without checking them out."""
+        with self._lock:
+            missing = min(count, self.size) - len(self._idle)
+        for _ in range(missing):
+            self.put(connect())
+
+    def idle(self):
+        with self._lock:
+            return len(self._idle)
+
+
+def get_pool(alias, size, timeout):
+    """The pool of a database alias in this process; forked workers start their own."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(size, timeout)
+        return _pools[key]
@@ -0,0 +1,84 @@
+from django.db.backends.postgresql import base
+
+from foodgram.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend with connection health checks and an optional pool.
+
+    With CONN_HEALTH_CHECKS a reused connection is checked with SELECT 1
+    before its first query in each request, and replaced if it is broken.
+    With POOL_SIZE connections are taken from a pool shared by the threads
+    of the process and given back to it instead of being closed.
+    """
+
+    health_check_enabled = False
+    health_check_done = False
+
+    @property
+    def pool(self):
+        size = self.settings_dict.get('POOL_SIZE')
+        if not size:
+            return None
+        return get_pool(self.alias, size, self.settings_dict.get('POOL_TIMEOUT', 10))
+
+    def connect(self):
+        self.health_check_enabled = self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+        # New connections are healthy; pooled ones are checked on checkout.
+        self.health_check_done = True
+        super().connect()
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            check=self.is_connection_usable if self.health_check_enabled else None,
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.release(self.connection)
+
+    def is_connection_usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def is_usable(self):
+        return self.is_connection_usable(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if self.connection is not None:
+            self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or self.health_check_done:
+            return
+        if not self.is_usable():
+            # Closed first so a pool drops it rather than taking it back.
+            self.connection.close()
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def warm_up(self, count, persistent=True):
+        """Opens count pooled connections or, with persistent, this thread's persistent connection."""
+        if self.pool is not None:
+            conn_params = self.get_connection_params()
+            self.pool.fill(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params), count)
+        elif persistent and self.settings_dict['CONN_MAX_AGE'] != 0:
+            self.ensure_connection()
@@ -0,0 +1,244 @@
+import itertools
+from unittest import mock
+
+from django.db import OperationalError as DatabaseOperationalError
+from django.db.backends.postgresql import base as postgresql_base
+from django.test import SimpleTestCase
+from psycopg2 import OperationalError
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_INTRANS,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+from foodgram.db import pool, warmup
+from foodgram.db.postgresql.base import DatabaseWrapper
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.connection.broken:
+            raise OperationalError('server closed the connection unexpectedly')
+        self.connection.queries.append(sql)
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    """Stands in for a psycopg2 connection; broken ones fail every query."""
+
+    ids = itertools.count()
+
+    def __init__(self):
+        self.id = next(self.ids)
+        self.closed = 0
+        self.broken = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.autocommit = False
+        self.isolation_level = None
+        self.queries = []
+        self.rollbacks = 0
+
+    def cursor(self, *args, **kwargs):
+        return StubCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def get_parameter_status(self, parameter):
+        return 'UTC'
+
+    def set_client_encoding(self, encoding):
+        pass
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = pool.ConnectionPool(size=2, timeout=0.05)
+        self.opened = []
+
+    def connect(self):
+        connection = StubConnection()
+        self.opened.append(connection)
+        return connection
+
+    def test_release_makes_connection_reusable(self):
+        connection = self.pool.acquire(self.connect)
+        self.pool.release(connection)
+        self.assertIs(self.pool.acquire(self.connect), connection)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_release_rolls_back_open_transaction(self):
+        connection = self.pool.acquire(self.connect)
+        connection.status = TRANSACTION_STATUS_INTRANS
+        self.pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(self.pool.idle(), 1)
+
+    def test_release_closes_connection_in_unknown_state(self):
+        connection = self.pool.acquire(self.connect)
+        connection.status = TRANSACTION_STATUS_UNKNOWN
+        self.pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool.idle(), 0)
+
+    def test_release_drops_closed_connection(self):
+        connection = self.pool.acquire(self.connect)
+        connection.close()
+        self.pool.release(connection)
+        self.assertEqual(self.pool.idle(), 0)
+        self.assertIsNot(self.pool.acquire(self.connect), connection)
+
+    def test_exhausted_pool_times_out(self):
+        self.pool.acquire(self.connect)
+        self.pool.acquire(self.connect)
+        with self.assertRaises(OperationalError):
+            self.pool.acquire(self.connect)
+
+    def test_release_frees_slot(self):
+        first = self.pool.acquire(self.connect)
+        self.pool.acquire(self.connect)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(self.connect), first)
+
+    def test_failed_connect_frees_slot(self):
+        def fail():
+            raise OperationalError('could not connect')
+
+        for _ in range(3):
+            with self.assertRaises(OperationalError):
+                self.pool.acquire(fail)
+        self.pool.acquire(self.connect)
+        self.pool.acquire(self.connect)
+
+    def test_failed_check_replaces_connection(self):
+        broken = self.pool.acquire(self.connect)
+        self.pool.release(broken)
+        connection = self.pool.acquire(self.connect, check=lambda connection: connection is not broken)
+        self.assertIsNot(connection, broken)
+        self.assertTrue(broken.closed)
+
+    def test_fill_opens_idle_connections_up_to_size(self):
+        self.pool.fill(self.connect, 5)
+        self.assertEqual(self.pool.idle(), 2)
+        self.pool.fill(self.connect, 5)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_get_pool_is_per_alias(self):
+        with mock.patch.dict(pool._pools, clear=True):
+            self.assertIs(pool.get_pool('default', 2, 1), pool.get_pool('default', 2, 1))
+            self.assertIsNot(pool.get_pool('default', 2, 1), pool.get_pool('replica', 2, 1))
+
+
+class DatabaseWrapperTest(SimpleTestCase):
+    """The backend against stub connections, so no Postgres server is needed."""
+
+    def setUp(self):
+        self.opened = []
+        patcher = mock.patch.object(postgresql_base.DatabaseWrapper, 'get_new_connection', self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pools = mock.patch.dict(pool._pools, clear=True)
+        pools.start()
+        self.addCleanup(pools.stop)
+
+    def connect(self, conn_params):
+        connection = StubConnection()
+        self.opened.append(connection)
+        return connection
+
+    def get_wrapper(self, **settings):
+        settings_dict = {
+            'ENGINE': 'foodgram.db.postgresql', 'NAME': 'foodgram', 'USER': '', 'PASSWORD': '',
+            'HOST': '', 'PORT': '', 'OPTIONS': {}, 'TIME_ZONE': None, 'AUTOCOMMIT': True,
+            'ATOMIC_REQUESTS': False, 'CONN_MAX_AGE': 0, 'TEST': {},
+        }
+        settings_dict.update(settings)
+        return DatabaseWrapper(settings_dict, alias='pooltest')
+
+    def test_close_returns_connection_to_pool(self):
+        wrapper = self.get_wrapper(POOL_SIZE=2, POOL_TIMEOUT=0.05)
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+        wrapper.close()
+        self.assertFalse(connection.closed)
+        self.assertEqual(wrapper.pool.idle(), 1)
+        other = self.get_wrapper(POOL_SIZE=2, POOL_TIMEOUT=0.05)
+        other.ensure_connection()
+        self.assertIs(other.connection, connection)
+
+    def test_threads_share_pool_size(self):
+        wrappers = [self.get_wrapper(POOL_SIZE=2, POOL_TIMEOUT=0.05) for _ in range(3)]
+        wrappers[0].ensure_connection()
+        wrappers[1].ensure_connection()
+        with self.assertRaises(DatabaseOperationalError):
+            wrappers[2].ensure_connection()
+        wrappers[0].close()
+        wrappers[2].ensure_connection()
+
+    def test_health_check_replaces_broken_connection(self):
+        wrapper = self.get_wrapper(CONN_MAX_AGE=None, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        broken = wrapper.connection
+        broken.broken = True
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 2')
+        self.assertTrue(broken.closed)
+        self.assertIsNot(wrapper.connection, broken)
+        self.assertEqual(wrapper.connection.queries, ['SELECT 2'])
+
+    def test_health_check_runs_once_per_request(self):
+        wrapper = self.get_wrapper(CONN_MAX_AGE=None, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()
+        for _ in range(2):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 2')
+        self.assertEqual(wrapper.connection.queries, ['SELECT 1', 'SELECT 2', 'SELECT 2'])
+
+    def test_pool_checkout_skips_broken_connection(self):
+        wrapper = self.get_wrapper(POOL_SIZE=2, POOL_TIMEOUT=0.05, CONN_HEALTH_CHECKS=True)
+        wrapper.warm_up(1)
+        broken = self.opened[0]
+        broken.broken = True
+        wrapper.ensure_connection()
+        self.assertTrue(broken.closed)
+        self.assertIsNot(wrapper.connection, broken)
+
+    def test_warm_up_fills_pool(self):
+        wrapper = self.get_wrapper(POOL_SIZE=3, POOL_TIMEOUT=0.05)
+        wrapper.warm_up(2)
+        self.assertEqual(wrapper.pool.idle(), 2)
+        self.assertIsNone(wrapper.connection)
+
+    def test_warm_up_without_pool(self):
+        wrapper = self.get_wrapper(CONN_MAX_AGE=None)
+        wrapper.warm_up(2, persistent=False)
+        self.assertEqual(self.opened, [])
+        wrapper.warm_up(2)
+        self.assertIsNotNone(wrapper.connection)
+
+    def test_warm_up_skips_wrappers_without_it(self):
+        wrapper = self.get_wrapper(CONN_MAX_AGE=None)
+        other = mock.Mock(spec=[])
+        with mock.patch.object(warmup, 'connections') as connections, \
+                self.settings(DB_WARMUP=2):
+            connections.all.return_value = [wrapper, other]
+            warmup.warm_up(persistent=False)
+        self.assertEqual(self.opened, [])
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.db import connections
+
+
+def warm_up(persistent=True):
+    """Opens DB_WARMUP connections per database before the first request.
+
+    Without a pool only this thread's persistent connection can be opened,
+    which helps servers whose requests run on the importing thread; pass
+    persistent=False where they do not, as under ASGI.
+    """
+    count = getattr(settings, 'DB_WARMUP', 0)
+    if not count:
+        return
+    for connection in connections.all():
+        if hasattr(connection, 'warm_up'):
+            connection.warm_up(count, persistent)
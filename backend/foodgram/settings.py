@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 import environ
@@ -46,9 +47,12 @@ INSTALLED_APPS = [
     'recipes',
     'api',
     'djoser',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +98,44 @@ DATABASES = {
     }
 }
 
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list('DB_REPLICA_URLS', default=[])):
+    DATABASE_REPLICAS.append(f'replica{index}')
+    DATABASES[f'replica{index}'] = {**env.db_url_config(url), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_CONNECTION = {
+    'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=0),
+    'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=False),
+    'POOL_SIZE': env.int('DB_POOL_SIZE', default=0),
+    'POOL_TIMEOUT': env.float('DB_POOL_TIMEOUT', default=10.0),
+}
+for database in DATABASES.values():
+    database.update(DATABASE_CONNECTION)
+    if database['ENGINE'] in ('django.db.backends.postgresql', 'django.db.backends.postgresql_psycopg2'):
+        # The stock backend with health checks and the optional pool.
+        database['ENGINE'] = 'foodgram.db.postgresql'
+DB_WARMUP = env.int('DB_WARMUP', default=0)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_LAG_SECONDS = env.int('REPLICA_LAG_SECONDS', default=5)
+
+CACHES = {
+    # Management commands such as rank_recipes invalidate through it, so by default it is shared on the host.
+    'default': env.cache(
+        'CACHE_URL', default=f'filecache://{os.path.join(tempfile.gettempdir(), "foodgram-cache")}'
+    ),
+    # Written by every worker and read by metrics_report, so shared by all processes on the host.
+    'metrics': env.cache(
+        'METRICS_CACHE_URL', default=f'filecache://{os.path.join(tempfile.gettempdir(), "foodgram-metrics")}'
+    ),
+}
+
+RESPONSE_CACHE_ALIAS = env('RESPONSE_CACHE_ALIAS', default='default')
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=600)
+
+# Gunicorn reads the same variable for its number of worker processes.
+WEB_CONCURRENCY = env.int('WEB_CONCURRENCY', default=1)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -119,7 +161,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
     'PAGE_SIZE': 10,
@@ -165,7 +207,54 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 USE_X_FORWARDED_HOST = True
 
+RECIPE_IMAGE_FORMAT = env('RECIPE_IMAGE_FORMAT', default='WEBP')
+RECIPE_IMAGE_QUALITY = env.int('RECIPE_IMAGE_QUALITY', default=80)
+RECIPE_IMAGE_ASYNC = env.bool('RECIPE_IMAGE_ASYNC', default=True)
+RECIPE_IMAGE_WORKERS = env.int('RECIPE_IMAGE_WORKERS', default=2)
+RECIPE_IMAGE_RETRIES = env.int('RECIPE_IMAGE_RETRIES', default=3)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+INGREDIENT_INDEX_TTL = env.int('INGREDIENT_INDEX_TTL', default=300)
+
+TRENDING_HALF_LIFE = env.int('TRENDING_HALF_LIFE', default=24 * 60 * 60)
+TRENDING_WINDOW = env.int('TRENDING_WINDOW', default=7 * 24 * 60 * 60)
+
+FEED_FANOUT_MAX_FOLLOWERS = env.int('FEED_FANOUT_MAX_FOLLOWERS', default=10000)
+FEED_FANOUT_MAX_RECIPES = env.int('FEED_FANOUT_MAX_RECIPES', default=1000)
+
+RECIPE_MATCHING_MAX_REPLAY = env.int('RECIPE_MATCHING_MAX_REPLAY', default=1000)
+RECIPE_MATCHING_LOG_TIMEOUT = env.int('RECIPE_MATCHING_LOG_TIMEOUT', default=24 * 60 * 60)
+
+AUTH_TOKEN_CACHE_SIZE = env.int('AUTH_TOKEN_CACHE_SIZE', default=10000)
+AUTH_TOKEN_CACHE_TTL = env.int('AUTH_TOKEN_CACHE_TTL', default=60)
+AUTH_TOKEN_CACHE_SHARED = env.bool('AUTH_TOKEN_CACHE_SHARED', default=False)
+
+SERVER_MODE = env('SERVER_MODE', default='wsgi')
+ASYNC_READ_THREADS = env.int('ASYNC_READ_THREADS', default=16)
+
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', default=0.0)
+METRICS_LOG_INTERVAL = env.int('METRICS_LOG_INTERVAL', default=60)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': env('METRICS_LOG_LEVEL', default='INFO'),
+        },
+        'recipes.images': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
+}
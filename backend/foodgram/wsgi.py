@@ -3,6 +3,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from foodgram.db.warmup import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+warm_up()
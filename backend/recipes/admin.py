@@ -37,7 +37,12 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientAmountInline,)
 
     def favorited(self, obj):
-        return obj.following_recipe.count()
+        return obj.favorites_count
+
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.processed_image = None
+        super().save_model(request, obj, form, change)
 
 
 class FavoriteRecipeAdmin(admin.ModelAdmin):
@@ -0,0 +1,111 @@
+import csv
+import json
+import re
+
+NAME_KEYS = ('name', 'title')
+UNIT_KEYS = ('measurement_unit', 'dimension', 'unit')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(value):
+    return WHITESPACE.sub(' ', str(value)).strip()
+
+
+def read_csv(stream):
+    for row in csv.reader(stream):
+        if len(row) < 2:
+            continue
+        if row[0].strip().lower() in NAME_KEYS and row[1].strip().lower() in UNIT_KEYS:
+            continue
+        yield row[0], row[1]
+
+
+def iter_json_array(stream, chunk_size=1 << 16):
+    """Yields items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    started = eof = False
+    # Items must be separated by single commas, so after an item only "," or "]" may follow.
+    after_item = empty = False
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if not started:
+                if char != '[':
+                    raise ValueError('Expected a JSON array')
+                started = empty = True
+                position += 1
+                continue
+            if after_item:
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ValueError(f'Expected "," or "]" after an array item, got {char!r}')
+                after_item = False
+                position += 1
+                continue
+            if char == ']' and empty:
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                # A number ending the buffer may go on in the next chunk.
+                if end < len(buffer) or eof:
+                    position, after_item, empty = end, True, False
+                    yield item
+                    continue
+        elif eof:
+            if started:
+                raise ValueError('Unterminated JSON array')
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def item_fields(item):
+    if 'model' in item and 'fields' in item:
+        if item['model'] != 'recipes.ingredient':
+            return None
+        item = item['fields']
+    name = next((item[key] for key in NAME_KEYS if key in item), None)
+    unit = next((item[key] for key in UNIT_KEYS if key in item), None)
+    if name is None or unit is None:
+        return None
+    return name, unit
+
+
+def read_json(stream):
+    position = stream.tell()
+    first = stream.read(1)
+    while first.isspace():
+        first = stream.read(1)
+    stream.seek(position)
+    if first == '[':
+        items = iter_json_array(stream)
+    else:
+        items = (json.loads(line) for line in stream if line.strip())
+    for item in items:
+        fields = item_fields(item)
+        if fields is not None:
+            yield fields
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'jsonl': read_json,
+}
+
+
+def read_catalog(stream, file_format):
+    for name, unit in READERS[file_format](stream):
+        name, unit = normalize(name), normalize(unit)
+        if name:
+            yield name, unit
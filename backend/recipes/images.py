@@ -0,0 +1,140 @@
+import hashlib
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import (DEFAULT_DB_ALIAS, IntegrityError, OperationalError,
+                       connections, transaction)
+from PIL import Image, ImageOps, features
+
+from recipes.models import Recipe, RecipeImage
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': 240,
+    'card': 640,
+    'full': 1600,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_format():
+    image_format = getattr(settings, 'RECIPE_IMAGE_FORMAT', 'WEBP').upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    elif variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA')
+    buffer = io.BytesIO()
+    variant.save(buffer, image_format, quality=getattr(settings, 'RECIPE_IMAGE_QUALITY', 80))
+    return buffer.getvalue()
+
+
+def build_recipe_image(content):
+    """Returns the RecipeImage for these bytes, rendering variants once per hash.
+
+    Variants are re-encoded from decoded pixels only, so EXIF and other
+    metadata of the upload are not carried over.
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    recipe_image = RecipeImage.objects.filter(content_hash=content_hash).first()
+    if recipe_image is not None:
+        return recipe_image
+
+    image_format = get_format()
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    with Image.open(io.BytesIO(content)) as source:
+        source.seek(0)
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    recipe_image = RecipeImage(content_hash=content_hash)
+    for variant, size in VARIANTS.items():
+        getattr(recipe_image, variant).save(
+            f'{content_hash}_{variant}.{extension}',
+            ContentFile(render_variant(image, size, image_format)),
+            save=False,
+        )
+    try:
+        with transaction.atomic():
+            recipe_image.save()
+    except IntegrityError:
+        for variant in VARIANTS:
+            getattr(recipe_image, variant).delete(save=False)
+        recipe_image = RecipeImage.objects.get(content_hash=content_hash)
+    return recipe_image
+
+
+def process_recipe_image(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return None
+    image_name = recipe.image.name
+    with recipe.image.open('rb') as image_file:
+        content = image_file.read()
+    recipe_image = build_recipe_image(content)
+    unchanged = Recipe.objects.filter(pk=recipe_id, image=image_name).exists()
+    if unchanged:
+        recipe.processed_image = recipe_image
+        recipe.save(update_fields=['processed_image'])
+    return recipe_image
+
+
+def process_or_log(recipe_id):
+    """Processes the image, retrying database errors such as lock timeouts.
+
+    Failures are logged rather than raised: the recipe keeps its original
+    image and process_recipe_images renders the variants later.
+    """
+    retries = getattr(settings, 'RECIPE_IMAGE_RETRIES', 3)
+    for attempt in range(retries + 1):
+        try:
+            return process_recipe_image(recipe_id)
+        except OperationalError:
+            # Inside a transaction the error may have aborted it, so only a fresh attempt can retry.
+            if attempt == retries or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+                logger.exception('Failed to process image of recipe %s', recipe_id)
+                return None
+            logger.warning('Retrying image of recipe %s after a database error', recipe_id, exc_info=True)
+            time.sleep(0.1 * 2 ** attempt)
+        except Exception:
+            logger.exception('Failed to process image of recipe %s', recipe_id)
+            return None
+
+
+def run_in_background(recipe_id):
+    try:
+        return process_or_log(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def use_background():
+    # SQLite has a single writer, so a background writer makes requests fail with "database is locked".
+    return getattr(settings, 'RECIPE_IMAGE_ASYNC', True) and connections[DEFAULT_DB_ALIAS].vendor != 'sqlite'
+
+
+def schedule_recipe_image(recipe_id):
+    global _executor
+    if not use_background():
+        return process_or_log(recipe_id)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECIPE_IMAGE_WORKERS', 2),
+                thread_name_prefix='recipe-images',
+            )
+    return _executor.submit(run_in_background, recipe_id)
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.5 on 2026-10-18 05:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_auto_20210721_2121'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='Хэш содержимого')),
+                ('thumbnail', models.ImageField(upload_to='recipes/variants', verbose_name='Миниатюра')),
+                ('card', models.ImageField(upload_to='recipes/variants', verbose_name='Карточка')),
+                ('full', models.ImageField(upload_to='recipes/variants', verbose_name='Полный размер')),
+            ],
+            options={
+                'verbose_name': 'Обработанное изображение',
+                'verbose_name_plural': 'Обработанные изображения',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='processed_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recipes', to='recipes.recipeimage', verbose_name='Обработанное изображение'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.5 on 2026-10-18 06:18
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+TRIGRAM_INDEX = 'ingredient_name_trgm_idx'
+MAX_AMOUNT = 32767
+
+
+def dedupe_tag_slugs(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    duplicated = Tag.objects.values('slug').annotate(total=Count('id')).filter(total__gt=1)
+    for slug in duplicated.values_list('slug', flat=True):
+        for tag in Tag.objects.filter(slug=slug).order_by('id')[1:]:
+            tag.slug = f'{slug}-{tag.pk}'
+            tag.save(update_fields=['slug'])
+
+
+def merge_ingredient_amounts(apps, schema_editor):
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    duplicated = IngredientAmount.objects.values('recipe', 'ingredient').annotate(
+        total=Count('id'), keep=Min('id'), amount=Sum('amount')
+    ).filter(total__gt=1)
+    for row in duplicated:
+        IngredientAmount.objects.filter(pk=row['keep']).update(amount=min(row['amount'], MAX_AMOUNT))
+        IngredientAmount.objects.filter(
+            recipe=row['recipe'], ingredient=row['ingredient']
+        ).exclude(pk=row['keep']).delete()
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX {TRIGRAM_INDEX} ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(db_index=True, max_length=200, verbose_name='Название ингредиента'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(dedupe_tag_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Уникальный слаг'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.RunPython(merge_ingredient_amounts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredientamount',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='ingredient_amount_unique'),
+        ),
+    ]
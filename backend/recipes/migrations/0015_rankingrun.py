@@ -0,0 +1,24 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_author_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed', models.DateTimeField(verbose_name='Время расчета')),
+            ],
+            options={
+                'verbose_name': 'Расчет рейтингов',
+                'verbose_name_plural': 'Расчеты рейтингов',
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -8,7 +9,7 @@ User = get_user_model()
 
 class Ingredient(models.Model):
 
-    name = models.CharField('Название ингредиента', max_length=200)
+    name = models.CharField('Название ингредиента', max_length=200, db_index=True)
     measurement_unit = models.CharField('Единица измерения', max_length=200)
 
     class Meta:
@@ -32,6 +33,9 @@ class IngredientAmount(models.Model):
     class Meta:
         verbose_name = 'Количество ингредиента'
         verbose_name_plural = 'Количества ингредиентов'
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'ingredient'], name='ingredient_amount_unique')
+        ]
     
     def __str__(self):
         return self.ingredient.name
@@ -40,7 +44,7 @@ class IngredientAmount(models.Model):
 class Tag(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')
     color = ColorField(default='#888888', verbose_name='Цвет в HEX')
-    slug = models.CharField(max_length=200, verbose_name='Уникальный слаг')
+    slug = models.CharField(max_length=200, unique=True, verbose_name='Уникальный слаг')
 
     class Meta:
         verbose_name = 'Тэг'
@@ -50,12 +54,30 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeImage(models.Model):
+    content_hash = models.CharField('Хэш содержимого', max_length=64, unique=True)
+    thumbnail = models.ImageField('Миниатюра', upload_to='recipes/variants')
+    card = models.ImageField('Карточка', upload_to='recipes/variants')
+    full = models.ImageField('Полный размер', upload_to='recipes/variants')
+
+    class Meta:
+        verbose_name = 'Обработанное изображение'
+        verbose_name_plural = 'Обработанные изображения'
+
+    def __str__(self):
+        return self.content_hash
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.SET_NULL, related_name='recipes', verbose_name='Автор', null=True
     )
     name = models.CharField('Название', max_length=200)
     image = models.ImageField(verbose_name='Изображение', upload_to='recipes')
+    processed_image = models.ForeignKey(
+        RecipeImage, on_delete=models.SET_NULL, related_name='recipes',
+        verbose_name='Обработанное изображение', null=True, blank=True, editable=False
+    )
     text = models.TextField('Описание', max_length=1000)
     ingredients = models.ManyToManyField(
         Ingredient, through=IngredientAmount, related_name='recipes', verbose_name='Список ингредиентов'
@@ -63,19 +85,100 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(Tag, related_name='recipes', verbose_name='Тэги')
     cooking_time = models.PositiveSmallIntegerField('Время приготовления', validators=[MinValueValidator(1)])
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField('В избранном', default=0, editable=False)
+    shopping_count = models.PositiveIntegerField('В списках покупок', default=0, editable=False)
+    search_vector = SearchVectorField('Поисковый вектор', null=True, editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeRank(models.Model):
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name='rank', verbose_name='Рецепт'
+    )
+    popularity = models.PositiveIntegerField('Популярность', default=0)
+    trending = models.FloatField('Популярность за последнее время', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(fields=['-popularity', '-recipe'], name='recipe_rank_popularity_idx'),
+            models.Index(fields=['-trending', '-recipe'], name='recipe_rank_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} rank'
+
+
+class RankingRun(models.Model):
+    """When rank_recipes last ran; trending scores are decayed from it and only newer events added."""
+
+    computed = models.DateTimeField('Время расчета')
+
+    class Meta:
+        verbose_name = 'Расчет рейтингов'
+        verbose_name_plural = 'Расчеты рейтингов'
+
+    def __str__(self):
+        return f'Rankings computed at {self.computed}'
+
+
+class RecipeSearchTerm(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='search_terms', verbose_name='Рецепт'
+    )
+    term = models.CharField('Основа слова', max_length=100)
+    weight = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        verbose_name = 'Поисковый терм'
+        verbose_name_plural = 'Поисковые термы'
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'recipe'], name='search_term_unique')
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline', verbose_name='Подписчик')
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='timeline_entries', verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name='Автор')
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'], name='timeline_unique')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'], name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} in timeline of {self.user}'
+
+
 class FavoriteRecipe(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="follower_recipe")
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="following_recipe")
+    created = models.DateTimeField('Дата добавления', auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -93,6 +196,7 @@ class FavoriteRecipe(models.Model):
 class ShoppingRecipe(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="shopper_recipe")
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="shopping_recipe")
+    created = models.DateTimeField('Дата добавления', auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -105,3 +209,26 @@ class ShoppingRecipe(models.Model):
 
     def __str__(self):
         return f'{self.user} shopping for recipe {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """A user's shopping list line: an ingredient summed over the recipes in their cart."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list', verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name='+', verbose_name='Ингредиент'
+    )
+    total = models.PositiveBigIntegerField('Количество')
+    recipes = models.PositiveIntegerField('Число рецептов')
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'], name='shopping_list_item_unique')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} in shopping list of {self.user}'
@@ -0,0 +1,110 @@
+import base64
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import OperationalError
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+
+from recipes import catalog, images
+from recipes.models import Recipe
+
+GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+class RecipeImageMixin:
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, RECIPE_IMAGE_RETRIES=2)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.recipe = Recipe(name='Recipe', text='Text', cooking_time=10)
+        self.recipe.image.save('recipe.gif', ContentFile(GIF), save=False)
+        Recipe.objects.bulk_create([self.recipe])
+        self.recipe = Recipe.objects.get()
+
+
+class RecipeImageTest(RecipeImageMixin, TestCase):
+    """Recipe images are processed in the background except on SQLite, and failures are logged."""
+
+    @override_settings(RECIPE_IMAGE_ASYNC=True)
+    def test_sqlite_processes_images_in_the_request(self):
+        with mock.patch.object(images, 'ThreadPoolExecutor') as executor:
+            recipe_image = images.schedule_recipe_image(self.recipe.pk)
+        executor.assert_not_called()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.processed_image, recipe_image)
+        self.assertTrue(recipe_image.thumbnail.name)
+
+    def test_other_databases_process_images_in_the_background(self):
+        postgres = {'default': mock.Mock(vendor='postgresql')}
+        with mock.patch.object(images, 'connections', postgres), \
+                mock.patch.object(images, '_executor', None), \
+                mock.patch.object(images, 'ThreadPoolExecutor') as executor:
+            images.schedule_recipe_image(self.recipe.pk)
+            with self.settings(RECIPE_IMAGE_ASYNC=False):
+                self.assertFalse(images.use_background())
+        executor.return_value.submit.assert_called_once_with(images.run_in_background, self.recipe.pk)
+
+    def test_failures_are_logged_not_raised(self):
+        self.recipe.image.delete(save=False)
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='recipes/missing.gif')
+        with self.assertLogs('recipes.images', 'ERROR'):
+            self.assertIsNone(images.schedule_recipe_image(self.recipe.pk))
+        self.recipe.refresh_from_db()
+        self.assertIsNone(self.recipe.processed_image)
+
+
+class RecipeImageRetryTest(RecipeImageMixin, TransactionTestCase):
+    """Outside a transaction, as after a commit, database errors are retried."""
+
+    def test_database_errors_are_retried(self):
+        process = images.process_recipe_image
+        calls = []
+
+        def flaky(recipe_id):
+            calls.append(recipe_id)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return process(recipe_id)
+
+        with mock.patch.object(images, 'process_recipe_image', flaky), \
+                mock.patch.object(images.time, 'sleep'), \
+                self.assertLogs('recipes.images', 'WARNING'):
+            self.assertIsNotNone(images.schedule_recipe_image(self.recipe.pk))
+        self.assertEqual(len(calls), 2)
+
+
+class CatalogTest(SimpleTestCase):
+    """JSON arrays are read item by item, whatever the chunk boundaries."""
+
+    def read(self, text, chunk_size):
+        return list(catalog.iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+    def test_items_across_chunk_boundaries(self):
+        text = ' [ {"name": "соль, йодированная", "unit": "г"} ,\n{"name": "[мука]", "unit": "кг"}, 3 ] '
+        expected = [{'name': 'соль, йодированная', 'unit': 'г'}, {'name': '[мука]', 'unit': 'кг'}, 3]
+        for chunk_size in (1, 2, 7, 1 << 16):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.read(text, chunk_size), expected)
+
+    def test_numbers_split_by_chunks(self):
+        self.assertEqual(self.read('[12,345]', 1), [12, 345])
+
+    def test_empty_array(self):
+        for chunk_size in (1, 1 << 16):
+            self.assertEqual(self.read(' [ ] ', chunk_size), [])
+
+    def test_malformed_arrays(self):
+        for text in ('[{"a": 1} {"b": 2}]', '[1 2]', '[1,,2]', '[,1]', '[1,]', '[1', '{"a": 1}', '[{"a": }]'):
+            for chunk_size in (1, 1 << 16):
+                with self.subTest(text=text, chunk_size=chunk_size), self.assertRaises(ValueError):
+                    self.read(text, chunk_size)
+
+    def test_read_catalog_normalizes_rows(self):
+        rows = catalog.read_catalog(io.StringIO('name,unit\n  Соль   морская ,г\n,шт\n'), 'csv')
+        self.assertEqual(list(rows), [('Соль морская', 'г')])
@@ -8,11 +8,20 @@ User = get_user_model()
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'username', 'email', 'first_name', 'last_name', 'is_staff')
+    list_display = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'recipes_count', 'followers_count'
+    )
     search_fields = ('id', 'username', 'first_name', 'email', )
     list_filter = ('username', 'email', )
+    list_select_related = ('stats', )
     empty_value_display = '-пусто-'
 
+    def recipes_count(self, obj):
+        return obj.stats.recipes_count if hasattr(obj, 'stats') else None
+
+    def followers_count(self, obj):
+        return obj.stats.followers_count if hasattr(obj, 'stats') else None
+
 
 class FollowUserAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author',)
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.5 on 2026-10-18 05:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_by_author(model):
+    return Coalesce(Subquery(
+        model.objects.filter(author=OuterRef('pk')).order_by().values('author')
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserStats = apps.get_model('users', 'UserStats')
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in User.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+    UserStats.objects.update(
+        recipes_count=count_by_author(apps.get_model('recipes', 'Recipe')),
+        followers_count=count_by_author(apps.get_model('users', 'FollowUser')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0008_recipe_counters'),
+        ('users', '0002_alter_followuser_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='auth.user', verbose_name='Пользователь')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]